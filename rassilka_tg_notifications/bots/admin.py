@@ -1,12 +1,31 @@
 from datetime import timezone as dt_timezone
-from .models import User, Message, FirstTouchSchedule, SecondTouchSchedule, Settings, Bot, PendingUser
+from .models import User, Message, TouchStep, TouchSchedule, Settings, Bot, PendingUser
 from django import forms
 from .admin_site import custom_admin_site
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 from django.contrib.auth.models import User as AuthUser, Group
 from django.contrib.auth.admin import UserAdmin as AuthUserAdmin, GroupAdmin
 
 
+class EstimatedCountPaginator(Paginator):
+    # Exact COUNT(*) on an unfiltered changelist gets slow on big tables, so use the planner estimate there.
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if connection.vendor == 'postgresql' and query is not None and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [query.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= self.exact_count_threshold:
+                return row[0]
+        return super().count
+
+
 class ScheduleAdminForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -27,52 +46,45 @@ class PendingUserAdmin(admin.ModelAdmin):
     list_filter = ('is_processed',)
     search_fields = ('telegram_id', 'name')
     ordering = ('created_at',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('telegram_id', 'name', 'responded', 'last_message_time')
-    list_filter = ('responded',)
+    list_display = ('telegram_id', 'name', 'bot', 'responded', 'last_message_time')
+    list_filter = ('responded', 'bot')
+    list_select_related = ('bot',)
+    autocomplete_fields = ('bot',)
     search_fields = ('telegram_id', 'name')
     ordering = ('telegram_id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ('text', 'is_second_touch')
-    list_filter = ('is_second_touch',)
+    list_display = ('text',)
     search_fields = ('text',)
 
 
-class FirstTouchScheduleAdmin(admin.ModelAdmin):
-    form = ScheduleAdminForm
-    list_display = ('user', 'message', 'scheduled_time_utc', 'original_scheduled_time_utc', 'sent')
-    list_filter = ('sent', 'scheduled_time')
-    search_fields = ('user__telegram_id', 'message__text')
-    ordering = ('scheduled_time',)
-    actions = ['delete_schedules']
-
-    def scheduled_time_utc(self, obj):
-        return obj.scheduled_time.astimezone(dt_timezone.utc)
-
-    scheduled_time_utc.short_description = 'Время добавления (UTC)'
-
-    def original_scheduled_time_utc(self, obj):
-        if obj.original_scheduled_time:
-            return obj.original_scheduled_time.astimezone(dt_timezone.utc)
-        return None
-
-    original_scheduled_time_utc.short_description = 'Изначальное время (UTC)'
-
-    @admin.action(description="Удалить выбранные расписания первого касания")
-    def delete_schedules(self, request, queryset):
-        queryset.delete()
+class TouchStepAdmin(admin.ModelAdmin):
+    list_display = ('step', 'message', 'delay_minutes', 'skip_if_responded')
+    list_select_related = ('message',)
+    autocomplete_fields = ('message',)
+    search_fields = ('message__text',)
+    ordering = ('step',)
 
 
-class SecondTouchScheduleAdmin(admin.ModelAdmin):
+class TouchScheduleAdmin(admin.ModelAdmin):
     form = ScheduleAdminForm
-    list_display = ('user', 'message', 'scheduled_time_utc', 'original_scheduled_time_utc', 'sent')
-    list_filter = ('sent', 'scheduled_time')
+    list_display = ('user', 'step', 'message', 'scheduled_time_utc', 'effective_time_utc', 'sent', 'cancelled', 'claimed_by')
+    list_filter = ('sent', 'cancelled', 'step', 'scheduled_time')
+    readonly_fields = ('claimed_by', 'lease_expires_at')
+    list_select_related = ('user__bot', 'step', 'message')
+    autocomplete_fields = ('user', 'step', 'message')
     search_fields = ('user__telegram_id', 'message__text')
     ordering = ('scheduled_time',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     actions = ['delete_schedules']
 
     def scheduled_time_utc(self, obj):
@@ -80,33 +92,33 @@ class SecondTouchScheduleAdmin(admin.ModelAdmin):
 
     scheduled_time_utc.short_description = 'Время добавления (UTC)'
 
-    def original_scheduled_time_utc(self, obj):
-        if obj.original_scheduled_time:
-            return obj.original_scheduled_time.astimezone(dt_timezone.utc)
+    def effective_time_utc(self, obj):
+        if obj.user.bot:
+            return obj.user.bot.effective_time(obj.scheduled_time).astimezone(dt_timezone.utc)
         return None
 
-    original_scheduled_time_utc.short_description = 'Изначальное время (UTC)'
+    effective_time_utc.short_description = 'Время отправки с учётом банов (UTC)'
 
-    @admin.action(description="Удалить выбранные расписания второго касания")
+    @admin.action(description="Удалить выбранные касания")
     def delete_schedules(self, request, queryset):
         queryset.delete()
 
 
 class SettingsAdmin(admin.ModelAdmin):
-    list_display = ('message_interval_minutes', 'ban_freeze_minutes', 'second_touch_delay_minutes', 'admin_telegram_id')
+    list_display = ('message_interval_minutes', 'ban_freeze_minutes', 'dispatch_batch_size', 'send_burst', 'max_sends_per_minute', 'admin_telegram_id')
 
 
 class BotAdmin(admin.ModelAdmin):
-    list_display = ('name', 'is_banned', 'banned_until')
-    list_filter = ('is_banned',)
-    search_fields = ('name',)
+    list_display = ('name', 'session_name', 'is_active', 'message_interval_minutes', 'is_banned', 'banned_until', 'schedule_offset')
+    list_filter = ('is_active', 'is_banned')
+    search_fields = ('name', 'session_name')
 
 
 custom_admin_site.register(PendingUser, PendingUserAdmin)
 custom_admin_site.register(User, UserAdmin)
 custom_admin_site.register(Message, MessageAdmin)
-custom_admin_site.register(FirstTouchSchedule, FirstTouchScheduleAdmin)
-custom_admin_site.register(SecondTouchSchedule, SecondTouchScheduleAdmin)
+custom_admin_site.register(TouchStep, TouchStepAdmin)
+custom_admin_site.register(TouchSchedule, TouchScheduleAdmin)
 custom_admin_site.register(Settings, SettingsAdmin)
 custom_admin_site.register(Bot, BotAdmin)
 custom_admin_site.register(AuthUser, AuthUserAdmin)
@@ -12,10 +12,10 @@ class CustomAdminSite(AdminSite):
             if app['app_label'] == 'bots':
                 app['name'] = "Основные настройки"
                 for model in app['models']:
-                    if model['object_name'] == 'FirstTouchSchedule':
-                        model['name'] = "Первые касания"
-                    elif model['object_name'] == 'SecondTouchSchedule':
-                        model['name'] = "Вторые касания"
+                    if model['object_name'] == 'TouchSchedule':
+                        model['name'] = "Касания"
+                    elif model['object_name'] == 'TouchStep':
+                        model['name'] = "Цепочка касаний"
                     elif model['object_name'] == 'User':
                         model['name'] = "Пользователи (Telegram)"
                     elif model['object_name'] == 'Message':
@@ -1,13 +1,4 @@
-import os
-
 from django.apps import AppConfig
-from dotenv import load_dotenv
-
-load_dotenv()
-
-API_ID = int(os.getenv('API_ID'))
-API_HASH = os.getenv('API_HASH')
-PHONE_NUMBER = os.getenv('PHONE_NUMBER')
 
 # Сообщения
 FIRST_TOUCH_MESSAGE = """
@@ -32,4 +23,13 @@ class BotsConfig(AppConfig):
     name = 'bots'
 
     def ready(self):
-        pass
\ No newline at end of file
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+        from bots.config import invalidate_config
+        from bots.metrics import install_query_counter
+        from bots.models import Bot, Settings
+
+        connection_created.connect(install_query_counter)
+        for model in (Settings, Bot):
+            post_save.connect(invalidate_config, sender=model)
+            post_delete.connect(invalidate_config, sender=model)
\ No newline at end of file
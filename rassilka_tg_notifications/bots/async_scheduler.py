@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.utils import timezone as django_timezone
+from bots import metrics
+from bots.leader import LeaderElection, STANDBY_POLL_SECONDS
+from bots.notify import SchedulerNotifier
+from bots.scheduler import (
+    IDLE_WAIT_SECONDS, acquire_send_slot, can_claim, claim_due_schedules, dispatcher_id, finish_claims,
+    get_next_schedule_time, prepare_dispatch, process_pending_users, reassign_orphaned_users, summarize_dispatch,
+    update_queue_depth,
+)
+from bots.senders import get_sender_backend
+from bots.tasks import db_call, send_message_async
+
+DB_THREADS = 4
+
+logger = logging.getLogger(__name__)
+
+
+async def dispatch_due_schedules_async(now, bot, batch_size):
+    allowed, wait = can_claim(bot)
+    if not allowed:
+        return [], wait
+
+    # Sends of all bots share one thread, so tell them apart by bot in the claim owner.
+    claimed_by = f"{dispatcher_id()}:{bot.session_name}"[:100]
+    due_schedules = await db_call(claim_due_schedules)(bot, now, batch_size, claimed_by)
+
+    sent_ids = []
+    retry_in = 0 if len(due_schedules) == batch_size else None
+    try:
+        for schedule in due_schedules:
+            allowed, wait = acquire_send_slot(bot)
+            if not allowed:
+                retry_in = wait
+                break
+
+            logger.debug("Processing touch #%s for user %s via %s", schedule.step.step, schedule.user.telegram_id, bot.name)
+            success = await send_message_async(schedule, bot=bot)
+            if success:
+                sent_ids.append(schedule.id)
+                logger.debug("Touch #%s for user %s processed successfully", schedule.step.step, schedule.user.telegram_id)
+            else:
+                logger.warning("Failed to process touch #%s for user %s", schedule.step.step, schedule.user.telegram_id)
+    finally:
+        await db_call(finish_claims)(due_schedules, sent_ids, claimed_by)
+
+    return due_schedules, retry_in
+
+
+async def dispatch_for_bot_async(bot, now, batch_size):
+    due_schedules, retry_in = await dispatch_due_schedules_async(now, bot, batch_size)
+    return len(due_schedules), retry_in
+
+
+async def process_schedules_async():
+    now, batch_size, bots = await db_call(prepare_dispatch)()
+    if not bots:
+        return None
+
+    results = await asyncio.gather(*(dispatch_for_bot_async(bot, now, batch_size) for bot in bots))
+    return summarize_dispatch(results)
+
+
+async def run_scheduler_async(db_threads=DB_THREADS):
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=db_threads, thread_name_prefix='scheduler-db'))
+    backend = get_sender_backend()
+    backend.bind_loop(loop)
+    notifier = SchedulerNotifier()
+    leader = LeaderElection(runtime='asyncio')
+    await db_call(metrics.start_publishing)()
+
+    logger.info("Starting asyncio scheduler with %s database threads...", db_threads)
+    try:
+        while True:
+            if not await db_call(leader.ensure)():
+                await db_call(notifier.close)()
+                await asyncio.sleep(STANDBY_POLL_SECONDS)
+                continue
+
+            with metrics.scheduler_loop_seconds.time(runtime='asyncio'):
+                await db_call(notifier.drain)()
+                dispatch = asyncio.create_task(process_schedules_async())
+                ingestion = asyncio.create_task(db_call(process_pending_users)())
+                retry_in, _ = await asyncio.gather(dispatch, ingestion)
+                await db_call(reassign_orphaned_users)()
+                await db_call(update_queue_depth)()
+
+            if retry_in is not None:
+                logger.debug("Due schedules left after this batch, retrying in %.2f seconds...", retry_in)
+                if retry_in > 0:
+                    await notifier.wait_async(retry_in)
+                continue
+
+            next_time = await db_call(get_next_schedule_time)()
+            now = django_timezone.localtime(django_timezone.now())
+
+            if next_time:
+                wait_seconds = max((next_time - now).total_seconds(), 1)
+                logger.debug("Next schedule at %s, waiting up to %.2f seconds...", next_time, wait_seconds)
+            else:
+                wait_seconds = IDLE_WAIT_SECONDS
+                logger.debug("No upcoming schedules, waiting up to %s seconds...", IDLE_WAIT_SECONDS)
+
+            notified = await notifier.wait_async(wait_seconds)
+            if notified:
+                logger.debug("Woken up by changes in %s", ', '.join(sorted(set(notified))))
+    finally:
+        notifier.close()
+        leader.release()
+        leader.close()
+        await backend.close()
@@ -0,0 +1,149 @@
+import os
+import atexit
+import asyncio
+import logging
+from threading import Thread, Lock, Event
+from telethon import TelegramClient
+from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
+from bots import metrics
+
+load_dotenv()
+
+HEALTH_CHECK_INTERVAL_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+class ClientPool:
+    def __init__(self, api_id, api_hash, phone_number=None, health_check_interval=HEALTH_CHECK_INTERVAL_SECONDS):
+        self.api_id = api_id
+        self.api_hash = api_hash
+        self.phone_number = phone_number
+        self.health_check_interval = health_check_interval
+        self._clients = {}
+        self._client_locks = {}
+        self._last_checked = {}
+        self._loop = None
+        self._thread = None
+        self._start_lock = Lock()
+
+    def _owns_dead_loop(self):
+        return self._thread is not None and not self._thread.is_alive()
+
+    def bind_loop(self, loop):
+        with self._start_lock:
+            if self._loop is not None and self._loop is not loop and not self._owns_dead_loop():
+                raise RuntimeError("Client pool is already running on another event loop")
+            self._loop = loop
+            self._thread = None
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is None or self._owns_dead_loop():
+                loop = asyncio.new_event_loop()
+                ready = Event()
+
+                def run_loop():
+                    asyncio.set_event_loop(loop)
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = Thread(target=run_loop, name='telegram-client-pool', daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+                self._clients.clear()
+                self._client_locks.clear()
+                self._last_checked.clear()
+        return self._loop
+
+    async def get_client(self, session):
+        lock = self._client_locks.setdefault(session, asyncio.Lock())
+        async with lock:
+            client = self._clients.get(session)
+            if client is None:
+                client = TelegramClient(session, self.api_id, self.api_hash)
+                self._clients[session] = client
+
+            if not client.is_connected():
+                logger.info("Connecting Telegram client '%s'...", session)
+                with metrics.telegram_connect_seconds.time(session=session):
+                    await client.connect()
+                self._last_checked.pop(session, None)
+
+            now = asyncio.get_running_loop().time()
+            if now - self._last_checked.get(session, 0) >= self.health_check_interval:
+                if not await client.is_user_authorized():
+                    await client.start(phone=self.phone_number)
+                    logger.info("Telegram client '%s' authorized successfully.", session)
+                self._last_checked[session] = now
+
+            return client
+
+    async def reset_client(self, session):
+        client = self._clients.pop(session, None)
+        self._last_checked.pop(session, None)
+        if client is not None:
+            try:
+                await client.disconnect()
+            except Exception as e:
+                logger.warning("Error disconnecting Telegram client '%s': %s", session, e)
+
+    async def _call(self, session, func):
+        client = await self.get_client(session)
+        try:
+            return await func(client)
+        except (ConnectionError, OSError):
+            logger.warning("Connection to Telegram lost for '%s', client will reconnect on next use.", session)
+            await self.reset_client(session)
+            raise
+
+    def run(self, session, func, timeout=None):
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._call(session, func), loop)
+        return future.result(timeout)
+
+    async def call(self, session, func):
+        loop = self._ensure_loop()
+        if loop is asyncio.get_running_loop():
+            return await self._call(session, func)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._call(session, func), loop))
+
+    async def disconnect_all(self):
+        for session in list(self._clients):
+            await self.reset_client(session)
+
+    def close(self):
+        if self._thread is None or not self._thread.is_alive():
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(self.disconnect_all(), self._loop).result(10)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_pool = None
+_pool_lock = Lock()
+
+
+def telegram_credentials():
+    api_id = os.getenv('API_ID')
+    api_hash = os.getenv('API_HASH')
+    if not api_id or not api_hash:
+        raise ImproperlyConfigured("API_ID and API_HASH must be set to connect to Telegram")
+    try:
+        return int(api_id), api_hash, os.getenv('PHONE_NUMBER')
+    except ValueError:
+        raise ImproperlyConfigured(f"API_ID must be an integer, got {api_id!r}")
+
+
+def get_client_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            api_id, api_hash, phone_number = telegram_credentials()
+            _pool = ClientPool(api_id=api_id, api_hash=api_hash, phone_number=phone_number)
+            atexit.register(_pool.close)
+    return _pool
@@ -0,0 +1,82 @@
+import copy
+import time
+from threading import Lock
+from django.conf import settings as django_settings
+
+DEFAULT_TTL_SECONDS = 30
+# Keys are table names so NOTIFY payloads from the scheduler triggers can invalidate entries directly.
+SETTINGS_KEY = 'bots_settings'
+BOTS_KEY = 'bots_bot'
+
+
+class ConfigCache:
+    """Process-wide TTL cache for rarely changing rows, dropped on save/delete signals and NOTIFY payloads."""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._entries = {}
+        self._generations = {}
+        self._lock = Lock()
+
+    def get_ttl(self):
+        if self.ttl is None:
+            return getattr(django_settings, 'BOTS_CONFIG_TTL_SECONDS', DEFAULT_TTL_SECONDS)
+        return self.ttl
+
+    def get(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+            generation = self._generations.get(key, 0)
+
+        value = loader()
+        with self._lock:
+            # Do not cache a value that was loaded while an invalidation came in.
+            if self._generations.get(key, 0) == generation:
+                self._entries[key] = (now + self.get_ttl(), value)
+        return value
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+
+config_cache = ConfigCache()
+
+
+def load_settings():
+    from bots.models import Settings
+
+    return Settings.objects.first() or Settings.objects.create()
+
+
+def load_bots():
+    from bots.models import Bot
+
+    return list(Bot.objects.order_by('pk'))
+
+
+def get_settings():
+    return config_cache.get(SETTINGS_KEY, load_settings)
+
+
+def get_bots(active_only=True):
+    # Callers toggle bans and save, so hand out copies rather than the cached instances.
+    return [copy.copy(bot) for bot in config_cache.get(BOTS_KEY, load_bots) if bot.is_active or not active_only]
+
+
+def get_default_bot():
+    bots = get_bots(active_only=False)
+    return bots[0] if bots else None
+
+
+def invalidate_config(sender, **kwargs):
+    config_cache.invalidate(sender._meta.db_table)
+
+
+def invalidate_from_notifications(payloads):
+    config_cache.invalidate(*(set(payloads) & {SETTINGS_KEY, BOTS_KEY}))
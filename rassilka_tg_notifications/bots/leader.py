@@ -0,0 +1,109 @@
+import logging
+import zlib
+from contextlib import contextmanager
+from django.db import connection
+from bots import metrics
+
+SCHEDULER_LOCK_NAME = 'bots_scheduler'
+STANDBY_POLL_SECONDS = 5
+# Server-side keepalives so Postgres drops the session of a vanished leader, releasing its lock.
+KEEPALIVE_SETTINGS = {
+    'tcp_keepalives_idle': 10,
+    'tcp_keepalives_interval': 5,
+    'tcp_keepalives_count': 3,
+}
+
+logger = logging.getLogger(__name__)
+
+
+def lock_key(name):
+    return zlib.crc32(name.encode())
+
+
+class LeaderElection:
+    """Session-level Postgres advisory lock held on a dedicated connection; other backends always lead."""
+
+    def __init__(self, name=SCHEDULER_LOCK_NAME, runtime='thread'):
+        self.name = name
+        self.key = lock_key(name)
+        self.runtime = runtime
+        self.is_leader = False
+        self._conn = None
+
+    @property
+    def enabled(self):
+        return connection.vendor == 'postgresql'
+
+    def _connect(self):
+        if self._conn is None or self._conn.closed:
+            conn = connection.get_new_connection(connection.get_connection_params())
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                for name, value in KEEPALIVE_SETTINGS.items():
+                    cursor.execute(f'SET {name} = {int(value)}')
+            self._conn = conn
+        return self._conn
+
+    def _try_lock(self):
+        with self._connect().cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [self.key])
+            return cursor.fetchone()[0]
+
+    def _unlock(self):
+        with self._connect().cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [self.key])
+
+    def _heartbeat(self):
+        # The lock lives as long as the session, so a live connection means we still hold it.
+        with self._connect().cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def _set_leader(self, is_leader):
+        if is_leader != self.is_leader:
+            if is_leader:
+                logger.info("Acquired scheduler leadership '%s' (%s runtime)", self.name, self.runtime)
+            else:
+                logger.warning("Lost scheduler leadership '%s' (%s runtime)", self.name, self.runtime)
+        self.is_leader = is_leader
+        metrics.scheduler_leader.set(int(is_leader), runtime=self.runtime)
+        return is_leader
+
+    def ensure(self):
+        """Heartbeat while leading, otherwise try to take over. Returns whether this process leads."""
+        if not self.enabled:
+            return self._set_leader(True)
+
+        try:
+            if self.is_leader:
+                self._heartbeat()
+                return self._set_leader(True)
+            return self._set_leader(self._try_lock())
+        except (OSError, connection.Database.Error) as e:
+            logger.warning("Error checking scheduler leadership: %s", e)
+            self.close()
+            return self._set_leader(False)
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the lock for the duration of the block only, for short-lived callers such as Celery tasks."""
+        acquired = self.is_leader or self.ensure()
+        try:
+            yield acquired
+        finally:
+            if acquired and self.enabled:
+                self.release()
+
+    def release(self):
+        if self.is_leader and self._conn is not None and not self._conn.closed:
+            try:
+                self._unlock()
+            except (OSError, connection.Database.Error) as e:
+                logger.warning("Error releasing scheduler leadership: %s", e)
+            logger.debug("Released scheduler leadership '%s' (%s runtime)", self.name, self.runtime)
+        self.is_leader = False
+        metrics.scheduler_leader.set(0, runtime=self.runtime)
+
+    def close(self):
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+        self._conn = None
@@ -0,0 +1,84 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+QUEUE_SIZE = 10000
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+CONSOLE_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(threadName)s] %(message)s'
+RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RESERVED_ATTRS)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BackgroundHandler(QueueHandler):
+    """Hands records to a listener thread that writes JSON to a rotating file and plain text to stderr."""
+
+    def __init__(self, filename, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT, console=True, queue_size=QUEUE_SIZE):
+        super().__init__(queue.Queue(queue_size))
+        self.dropped = 0
+        self.closed = False
+
+        file_handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        file_handler.setFormatter(JsonFormatter())
+        handlers = [file_handler]
+        if console:
+            console_handler = logging.StreamHandler(sys.stderr)
+            console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+            handlers.append(console_handler)
+
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.close)
+        # Celery prefork workers fork after logging is configured, and the child does not inherit the listener thread.
+        os.register_at_fork(after_in_child=self.restart_in_child)
+
+    def restart_in_child(self):
+        if self.closed:
+            return
+        # The parent's listener may have held the queue lock at fork time, so start from a fresh queue.
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.listener = QueueListener(self.queue, *self.listener.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record):
+        # Merge args here so the record no longer references live objects, but leave formatting to the listener.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self.closed = True
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from unittest import mock
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from bots import metrics
+from bots.models import PendingUser, User, Message, TouchStep, TouchSchedule, Settings, Bot
+from bots.scheduler import (
+    BULK_BATCH_SIZE, get_next_schedule_time, process_pending_users, process_schedules, update_queue_depth,
+)
+from bots.senders import reset_sender_backend
+from bots.slots import clamp_to_working_hours
+
+DEFAULT_SIZES = '1000,10000'
+DEFAULT_THRESHOLD = 0.2
+# Timings below this are dominated by noise, so they are never reported as regressions.
+MIN_WALL_SECONDS = 0.05
+BOT_SAVE_ROUNDS = 100
+BOTS = (
+    {'name': 'Bench A', 'session_name': 'bench_a'},
+    {'name': 'Bench B', 'session_name': 'bench_b', 'message_interval_minutes': 3},
+    {'name': 'Bench Banned', 'session_name': 'bench_banned', 'is_banned': True},
+)
+
+
+def measure(func):
+    queries_before = metrics.db_queries_total.total()
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        func()
+    finally:
+        wall = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'wall_seconds': round(wall, 4),
+        'queries': int(metrics.db_queries_total.total() - queries_before),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def reset_data():
+    for model in (TouchSchedule, User, PendingUser, TouchStep, Message, Bot, Settings):
+        model.objects.all().delete()
+
+
+def seed(size, now):
+    Settings.objects.create(dispatch_batch_size=size, send_burst=size, max_sends_per_minute=size * 60)
+    for fields in BOTS:
+        Bot.objects.create(banned_until=now + timedelta(days=1) if fields.get('is_banned') else None, **fields)
+
+    for step, delay in enumerate((0, 1440, 4320), start=1):
+        message = Message.objects.create(text=f"Benchmark touch #{step}")
+        TouchStep.objects.create(step=step, message=message, delay_minutes=delay)
+
+    PendingUser.objects.bulk_create(
+        (PendingUser(telegram_id=f"bench_{index:07d}", name=f"Lead {index}") for index in range(size)),
+        batch_size=BULK_BATCH_SIZE
+    )
+
+
+def make_first_touches_due(now):
+    TouchSchedule.objects.filter(step__step=1).update(scheduled_time=now - timedelta(minutes=1))
+
+
+def toggle_bot_ban():
+    bot = Bot.objects.filter(is_banned=False).first()
+    for _ in range(BOT_SAVE_ROUNDS):
+        bot.is_banned = True
+        bot.save()
+        bot.is_banned = False
+        bot.save()
+
+
+def clamp_many(size, now):
+    def run():
+        for minute in range(size):
+            clamp_to_working_hours(now + timedelta(minutes=minute))
+    return run
+
+
+def run_size(size, now):
+    reset_data()
+    seed(size, now)
+    results = {'process_pending_users': measure(process_pending_users)}
+    make_first_touches_due(now)
+    results['process_schedules'] = measure(process_schedules)
+    results['get_next_schedule_time'] = measure(get_next_schedule_time)
+    results['update_queue_depth'] = measure(update_queue_depth)
+    results['clamp_to_working_hours'] = measure(clamp_many(size, now))
+    results['bot_save'] = measure(toggle_bot_ban)
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for size, entries in results.items():
+        for entry, current in entries.items():
+            previous = baseline.get(size, {}).get(entry)
+            if not previous:
+                continue
+            for key in ('wall_seconds', 'queries', 'peak_kib'):
+                if key == 'wall_seconds' and current[key] < MIN_WALL_SECONDS:
+                    continue
+                if previous.get(key) and current[key] > previous[key] * (1 + threshold):
+                    regressions.append(f"{entry}[{size}] {key}: {previous[key]} -> {current[key]}")
+    return regressions
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the scheduler and ingestion entry points on synthetic data in a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Comma-separated lead counts to seed, e.g. 1000,10000,100000")
+        parser.add_argument('--output', help="Write results as JSON to this file")
+        parser.add_argument('--baseline', help="JSON file from a previous run to compare against")
+        parser.add_argument('--sender-latency', type=float, default=0.0, help="Simulated Telegram latency per message in seconds")
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Allowed relative regression, 0.2 means 20%%")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be a comma-separated list of integers")
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)['results']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {e}")
+
+        now = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+        if options['verbosity'] < 2:
+            logging.getLogger('bots').setLevel(logging.ERROR)
+        if connection.vendor == 'sqlite':
+            # Dispatch threads write concurrently: the shared-cache in-memory test database and deferred
+            # transactions both fail with "database is locked" instead of waiting.
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'bots_benchmark.sqlite3')
+            connection.settings_dict['OPTIONS'].update(transaction_mode='IMMEDIATE', timeout=30)
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        results = {}
+        try:
+            fake_sender = override_settings(
+                BOTS_SENDER_BACKEND='bots.senders.FakeBackend',
+                BOTS_SENDER_OPTIONS={'latency': options['sender_latency'], 'seed': 0},
+            )
+            with mock.patch('django.utils.timezone.now', return_value=now), fake_sender:
+                reset_sender_backend()
+                for size in sizes:
+                    self.stdout.write(f"Seeding {size} leads...")
+                    results[str(size)] = run_size(size, now)
+                    for entry, result in results[str(size)].items():
+                        self.stdout.write(
+                            f"  {entry:<24} {result['wall_seconds']:>9.4f}s {result['queries']:>8} queries {result['peak_kib']:>10.1f} KiB"
+                        )
+        finally:
+            reset_sender_backend()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'meta': {
+                'vendor': connection.vendor,
+                'python': platform.python_version(),
+                'started_at': timezone.now().isoformat(),
+                'sizes': sizes,
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = find_regressions(results, baseline, options['threshold'])
+            if regressions:
+                raise CommandError("Performance regressions:\n" + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f"No regressions beyond {options['threshold']:.0%} against the baseline"))
@@ -0,0 +1,205 @@
+import csv
+import json
+import re
+import sys
+import time
+from collections import Counter
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from bots.models import PendingUser, User
+
+BATCH_SIZE = 5000
+STAGING_TABLE = 'bots_lead_staging'
+# Same layout as the rest of the app: telegram_id is the numeric account id the listener matches replies
+# against, name is the username messages are delivered to. Display names are never used as recipients.
+ID_FIELDS = ('telegram_id', 'user_id', 'id')
+USERNAME_FIELDS = ('username', 'login')
+LINK_PREFIX = re.compile(r'^(?:https?://)?(?:www\.)?(?:t\.me|telegram\.me)/', re.IGNORECASE)
+VALID_ID = re.compile(r'^\d{1,20}$')
+VALID_USERNAME = re.compile(r'^[a-z][a-z0-9_]{4,31}$')
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def pick(record, fields):
+    for field in fields:
+        value = record.get(field)
+        if value not in (None, ''):
+            return str(value)
+    return ''
+
+
+def read_csv(stream, has_header=True):
+    reader = csv.reader(stream)
+    if not has_header:
+        for row in reader:
+            if row:
+                yield row[0], row[1] if len(row) > 1 else ''
+        return
+
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [column.strip().lower() for column in header]
+    if not set(columns) & set(ID_FIELDS) or not set(columns) & set(USERNAME_FIELDS):
+        raise CommandError(
+            f"CSV header must contain one of: {', '.join(ID_FIELDS)} and one of: {', '.join(USERNAME_FIELDS)} (or pass --no-header)"
+        )
+    for row in reader:
+        record = dict(zip(columns, row))
+        yield pick(record, ID_FIELDS), pick(record, USERNAME_FIELDS)
+
+
+def read_jsonl(stream, stats):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            stats['malformed'] += 1
+            continue
+        if isinstance(record, dict):
+            yield pick(record, ID_FIELDS), pick(record, USERNAME_FIELDS)
+        else:
+            stats['malformed'] += 1
+
+
+def normalize_username(username):
+    return LINK_PREFIX.sub('', username.strip()).lstrip('@').split('?')[0].strip('/').lower()
+
+
+def normalize_leads(rows, stats):
+    for telegram_id, username in rows:
+        stats['read'] += 1
+        telegram_id = telegram_id.strip()
+        username = normalize_username(username)
+        if not VALID_ID.match(telegram_id) or not VALID_USERNAME.match(username):
+            stats['invalid'] += 1
+            continue
+        yield telegram_id, username
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class CopyStream:
+    """File-like adapter that feeds generator rows to COPY ... FROM STDIN without buffering the whole input."""
+
+    def __init__(self, leads):
+        self._lines = (f"{telegram_id}\t{name.translate(COPY_ESCAPES)}\n" for telegram_id, name in leads)
+        self._buffer = ''
+        self.error = None
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                line = next(self._lines, None)
+            except Exception as e:
+                # psycopg2 would report this as a cancelled COPY, so end the input and let the caller re-raise it.
+                self.error = e
+                line = None
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def import_with_copy(leads, stats):
+    pending_table = PendingUser._meta.db_table
+    user_table = User._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE {STAGING_TABLE} (telegram_id varchar(50) NOT NULL, name varchar(100) NOT NULL) ON COMMIT DROP"
+        )
+        stream = CopyStream(leads)
+        cursor.copy_expert(f"COPY {STAGING_TABLE} (telegram_id, name) FROM STDIN", stream)
+        if stream.error:
+            raise stream.error
+
+        cursor.execute(
+            f"SELECT count(DISTINCT s.telegram_id), count(DISTINCT u.telegram_id) "
+            f"FROM {STAGING_TABLE} s LEFT JOIN {user_table} u ON u.telegram_id = s.telegram_id"
+        )
+        stats['unique'], stats['existing_users'] = cursor.fetchone()
+
+        cursor.execute(
+            f"INSERT INTO {pending_table} (telegram_id, name, created_at, is_processed) "
+            f"SELECT DISTINCT ON (s.telegram_id) s.telegram_id, s.name, now(), false "
+            f"FROM {STAGING_TABLE} s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {user_table} u WHERE u.telegram_id = s.telegram_id) "
+            f"ORDER BY s.telegram_id "
+            f"ON CONFLICT (telegram_id) DO NOTHING"
+        )
+        stats['imported'] = cursor.rowcount
+
+
+def import_with_orm(leads, stats, batch_size):
+    before = PendingUser.objects.count()
+    for batch in batched(leads, batch_size):
+        names = dict(batch)
+        stats['unique'] += len(names)
+        existing_users = set(User.objects.filter(telegram_id__in=names).values_list('telegram_id', flat=True))
+        stats['existing_users'] += len(existing_users)
+        PendingUser.objects.bulk_create(
+            [PendingUser(telegram_id=telegram_id, name=name) for telegram_id, name in names.items() if telegram_id not in existing_users],
+            batch_size=batch_size,
+            ignore_conflicts=True
+        )
+    stats['imported'] = PendingUser.objects.count() - before
+
+
+class Command(BaseCommand):
+    help = 'Import leads from a CSV or JSONL file into the pending users queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file, '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Input format, guessed from the file extension by default")
+        parser.add_argument('--no-header', action='store_true', help="CSV has no header, the first column is the numeric Telegram ID and the second the username")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows per batch when COPY is not available")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if path == '-' and not options['format']:
+            raise CommandError("--format is required when reading from stdin")
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+        stats = Counter()
+        started = time.monotonic()
+        try:
+            if input_format == 'jsonl':
+                rows = read_jsonl(stream, stats)
+            else:
+                rows = read_csv(stream, has_header=not options['no_header'])
+            leads = normalize_leads(rows, stats)
+            if connection.vendor == 'postgresql':
+                import_with_copy(leads, stats)
+            else:
+                import_with_orm(leads, stats, max(options['batch_size'], 1))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        elapsed = time.monotonic() - started
+        valid = stats['read'] - stats['invalid']
+        self.stdout.write(f"Rows read:               {stats['read']}")
+        self.stdout.write(f"Malformed lines:         {stats['malformed']}")
+        self.stdout.write(f"Invalid id or username:  {stats['invalid']}")
+        self.stdout.write(f"Duplicates in input:     {valid - stats['unique']}")
+        self.stdout.write(f"Already users:           {stats['existing_users']}")
+        self.stdout.write(f"Already queued:          {stats['unique'] - stats['existing_users'] - stats['imported']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['imported']} leads in {elapsed:.2f}s ({stats['read'] / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
@@ -1,30 +1,33 @@
-import os
 import asyncio
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.core.exceptions import ImproperlyConfigured
 from telethon import TelegramClient
-from dotenv import load_dotenv
+from bots.client_pool import telegram_credentials
 
-load_dotenv()
-
-API_ID = int(os.getenv('API_ID'))
-API_HASH = os.getenv('API_HASH')
-PHONE_NUMBER = os.getenv('PHONE_NUMBER')
 SESSION_FILE = 'sender'
 
 
 class Command(BaseCommand):
     help = 'Initialize or verify Telegram session'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--session', default=SESSION_FILE, help="Session file of the bot account (Bot.session_name)")
+
     def handle(self, *args, **kwargs):
-        client = TelegramClient(SESSION_FILE, API_ID, API_HASH)
+        session = kwargs['session']
+        try:
+            api_id, api_hash, phone_number = telegram_credentials()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        client = TelegramClient(session, api_id, api_hash)
 
         async def check_session():
-            self.stdout.write("Checking Telegram session...")
+            self.stdout.write(f"Checking Telegram session '{session}'...")
             await client.connect()
             if not await client.is_user_authorized():
-                self.stdout.write(f"Session not found or invalid. Requesting code for {PHONE_NUMBER}")
-                await client.sign_in(phone=PHONE_NUMBER)
-                code = input(f"Enter the code sent to {PHONE_NUMBER}: ")
+                self.stdout.write(f"Session not found or invalid. Requesting code for {phone_number}")
+                await client.sign_in(phone=phone_number)
+                code = input(f"Enter the code sent to {phone_number}: ")
                 try:
                     await client.sign_in(code=code)
                     self.stdout.write(self.style.SUCCESS("Telegram session created successfully!"))
@@ -0,0 +1,16 @@
+import asyncio
+from django.core.management.base import BaseCommand
+from bots.async_scheduler import DB_THREADS, run_scheduler_async
+
+
+class Command(BaseCommand):
+    help = 'Run dispatch, ingestion and wakeups on a single asyncio event loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--db-threads', type=int, default=DB_THREADS, help="Size of the thread pool used for ORM calls")
+
+    def handle(self, *args, **kwargs):
+        try:
+            asyncio.run(run_scheduler_async(kwargs['db_threads']))
+        except KeyboardInterrupt:
+            self.stdout.write("Scheduler stopped.")
@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import socket
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock, Thread
+
+# Hand-rolled Prometheus text exposition so the hot paths only touch in-memory counters.
+# Sends happen in the scheduler leader or in Celery workers while /metrics is served by any web worker, so every
+# process publishes a snapshot of its samples, labelled with instance="<host>:<pid>", to BOTS_METRICS_REDIS_URL
+# and /metrics renders the snapshots of all live processes. Without Redis it serves only its own process.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600, 86400)
+
+REGISTRY = []
+PUBLISH_INTERVAL_SECONDS = 10
+SNAPSHOT_TTL_SECONDS = 3 * PUBLISH_INTERVAL_SECONDS
+SNAPSHOT_KEY_PREFIX = 'bots:metrics:'
+REDIS_TIMEOUT_SECONDS = 1
+
+logger = logging.getLogger(__name__)
+
+
+LABEL_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n'})
+
+
+def format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{str(value).translate(LABEL_ESCAPES)}"' for name, value in pairs) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self, extra=()):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            yield self.name, format_labels(self.labelnames, key, extra), value
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def sample_lines(self, extra=()):
+        return [f"{name}{labels} {format_value(value)}" for name, labels, value in self.samples(extra)]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def replace(self, values):
+        with self._lock:
+            self._values = {self._key(labels): value for labels, value in values}
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self, extra=()):
+        extra = list(extra)
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", format_labels(self.labelnames, key, extra + [('le', format_value(bound))]), cumulative
+            yield f"{self.name}_count", format_labels(self.labelnames, key, extra), cumulative
+            yield f"{self.name}_sum", format_labels(self.labelnames, key, extra), total
+
+
+def instance_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def snapshot():
+    extra = [('instance', instance_id())]
+    return {metric.name: metric.sample_lines(extra) for metric in REGISTRY}
+
+
+def render_snapshots(snapshots):
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.header())
+        for samples in snapshots:
+            lines.extend(samples.get(metric.name, ()))
+    return '\n'.join(lines) + '\n'
+
+
+class SnapshotStore:
+    """Keeps one expiring Redis key per process with its latest samples."""
+
+    def __init__(self):
+        self._client = None
+        self._pid = None
+        self._lock = Lock()
+        self._failing = False
+
+    @property
+    def client(self):
+        from django.conf import settings
+
+        url = getattr(settings, 'BOTS_METRICS_REDIS_URL', '')
+        if not url:
+            return None
+        with self._lock:
+            # Connections and the publisher thread do not survive a fork, so start over in the child.
+            if self._pid != os.getpid():
+                import redis
+
+                self._client = redis.Redis.from_url(
+                    url, socket_timeout=REDIS_TIMEOUT_SECONDS, socket_connect_timeout=REDIS_TIMEOUT_SECONDS
+                )
+                self._pid = os.getpid()
+                Thread(target=self._publish_loop, name='metrics-publisher', daemon=True).start()
+        return self._client
+
+    def publish(self):
+        client = self.client
+        if client is not None:
+            client.set(SNAPSHOT_KEY_PREFIX + instance_id(), json.dumps(snapshot()), ex=SNAPSHOT_TTL_SECONDS)
+
+    def _publish_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            try:
+                self.publish()
+            except Exception as e:
+                self.failed("Error publishing metrics snapshot: %s", e)
+            else:
+                self.recovered()
+            time.sleep(PUBLISH_INTERVAL_SECONDS)
+
+    def failed(self, message, error):
+        # Warn once per Redis outage rather than on every interval and scrape.
+        if not self._failing:
+            logger.warning(message, error)
+        self._failing = True
+
+    def recovered(self):
+        if self._failing:
+            logger.info("Metrics snapshots are shared again")
+        self._failing = False
+
+    def collect(self):
+        client = self.client
+        if client is None:
+            return [snapshot()]
+        self.publish()
+        keys = sorted(client.scan_iter(match=SNAPSHOT_KEY_PREFIX + '*', count=100))
+        snapshots = [json.loads(value) for value in client.mget(keys) if value]
+        self.recovered()
+        return snapshots or [snapshot()]
+
+
+snapshot_store = SnapshotStore()
+
+
+def start_publishing():
+    try:
+        snapshot_store.client
+    except Exception as e:
+        logger.warning("Metrics snapshots are not shared: %s", e)
+
+
+def render():
+    try:
+        snapshots = snapshot_store.collect()
+    except Exception as e:
+        snapshot_store.failed("Cannot read metrics snapshots, serving this process only: %s", e)
+        snapshots = [snapshot()]
+    return render_snapshots(snapshots)
+
+
+telegram_connect_seconds = Histogram('bots_telegram_connect_seconds', 'Time spent connecting Telegram clients', ['session'])
+telegram_resolve_seconds = Histogram('bots_telegram_resolve_seconds', 'Time spent resolving usernames to peers', ['session'])
+telegram_send_seconds = Histogram('bots_telegram_send_seconds', 'Time spent in send_message calls to Telegram', ['session'])
+dispatch_lag_seconds = Histogram('bots_dispatch_lag_seconds', 'Delay between scheduled_time and the actual send', ['step'], buckets=LAG_BUCKETS)
+messages_sent_total = Counter('bots_messages_sent_total', 'Touches delivered to Telegram', ['session', 'step'])
+send_errors_total = Counter('bots_send_errors_total', 'Touches that failed with an error', ['session'])
+flood_waits_total = Counter('bots_flood_waits_total', 'FloodWait errors received from Telegram', ['session'])
+flood_wait_seconds_total = Counter('bots_flood_wait_seconds_total', 'Seconds of FloodWait imposed by Telegram', ['session'])
+bot_banned = Gauge('bots_bot_banned', 'Whether the bot is currently frozen after a ban', ['session'])
+queue_depth = Gauge('bots_queue_depth', 'Pending touches per step, refreshed on every scheduler tick', ['step'])
+scheduler_leader = Gauge('bots_scheduler_leader', 'Whether this process holds the scheduler advisory lock', ['runtime'])
+scheduler_loop_seconds = Histogram('bots_scheduler_loop_seconds', 'Duration of a scheduler tick', ['runtime'])
+db_queries_total = Counter('bots_db_queries_total', 'SQL statements executed by this process', ['vendor'])
+
+
+def count_query(execute, sql, params, many, context):
+    db_queries_total.inc(vendor=context['connection'].vendor)
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
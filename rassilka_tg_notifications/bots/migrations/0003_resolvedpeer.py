@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 15:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0002_auto_20250501_2257'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResolvedPeer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session', models.CharField(max_length=100, verbose_name='Сессия')),
+                ('peer_id', models.BigIntegerField(verbose_name='ID в Telegram')),
+                ('access_hash', models.BigIntegerField(verbose_name='Access hash')),
+                ('resolved_at', models.DateTimeField(auto_now=True, verbose_name='Время получения')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resolved_peers', to='bots.user', verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Найденный пир',
+                'verbose_name_plural': 'Найденные пиры',
+                'constraints': [models.UniqueConstraint(fields=('user', 'session'), name='bots_resolvedpeer_user_session_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0003_resolvedpeer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='settings',
+            name='dispatch_batch_size',
+            field=models.PositiveIntegerField(default=1, verbose_name='Максимум отправок каждого касания за проход'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+NOTIFY_TABLES = [
+    'bots_pendinguser',
+    'bots_firsttouchschedule',
+    'bots_secondtouchschedule',
+    'bots_bot',
+    'bots_settings',
+]
+
+
+def create_notify_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute("""
+        CREATE OR REPLACE FUNCTION bots_notify_scheduler() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('bots_scheduler', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table in NOTIFY_TABLES:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_notify_scheduler ON {table};")
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_notify_scheduler "
+            f"AFTER INSERT OR UPDATE ON {table} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION bots_notify_scheduler();"
+        )
+
+
+def drop_notify_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for table in NOTIFY_TABLES:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_notify_scheduler ON {table};")
+    schema_editor.execute("DROP FUNCTION IF EXISTS bots_notify_scheduler();")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('bots', '0004_settings_dispatch_batch_size'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_notify_triggers, drop_notify_triggers),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0005_scheduler_notify_triggers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='firsttouchschedule',
+            index=models.Index(condition=models.Q(('sent', False)), fields=['scheduled_time'], name='bots_first_unsent_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='firsttouchschedule',
+            index=models.Index(fields=['user', 'sent'], name='bots_first_user_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pendinguser',
+            index=models.Index(condition=models.Q(('is_processed', False)), fields=['created_at'], name='bots_pending_unprocessed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='secondtouchschedule',
+            index=models.Index(condition=models.Q(('sent', False)), fields=['scheduled_time'], name='bots_second_unsent_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='secondtouchschedule',
+            index=models.Index(fields=['user', 'sent'], name='bots_second_user_sent_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2 on 2026-10-18 15:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def assign_existing_accounts(apps, schema_editor):
+    Bot = apps.get_model('bots', 'Bot')
+    User = apps.get_model('bots', 'User')
+
+    bots = list(Bot.objects.order_by('id'))
+    if not bots:
+        return
+
+    # Первый бот продолжает работать со старой сессией 'sender'
+    for bot in bots[1:]:
+        bot.session_name = f"sender_{bot.id}"
+        bot.save(update_fields=['session_name'])
+
+    User.objects.filter(bot__isnull=True).update(bot=bots[0])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0006_scheduler_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bot',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='Активен'),
+        ),
+        migrations.AddField(
+            model_name='bot',
+            name='message_interval_minutes',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Интервал между сообщениями (минуты)'),
+        ),
+        migrations.AddField(
+            model_name='bot',
+            name='session_name',
+            field=models.CharField(default='sender', max_length=100, verbose_name='Файл сессии'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='bot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='bots.bot', verbose_name='Бот'),
+        ),
+        migrations.RunPython(assign_existing_accounts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bot',
+            name='session_name',
+            field=models.CharField(default='sender', max_length=100, unique=True, verbose_name='Файл сессии'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0007_bot_accounts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='settings',
+            name='max_sends_per_minute',
+            field=models.FloatField(default=1.0, verbose_name='Максимум сообщений в минуту (на бота)'),
+        ),
+        migrations.AddField(
+            model_name='settings',
+            name='send_burst',
+            field=models.PositiveIntegerField(default=3, verbose_name='Сообщений подряд без паузы (на бота)'),
+        ),
+    ]
@@ -0,0 +1,129 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_touches_to_sequence(apps, schema_editor):
+    Message = apps.get_model('bots', 'Message')
+    Settings = apps.get_model('bots', 'Settings')
+    TouchStep = apps.get_model('bots', 'TouchStep')
+    TouchSchedule = apps.get_model('bots', 'TouchSchedule')
+    FirstTouchSchedule = apps.get_model('bots', 'FirstTouchSchedule')
+    SecondTouchSchedule = apps.get_model('bots', 'SecondTouchSchedule')
+
+    settings = Settings.objects.first()
+    second_touch_delay_minutes = settings.second_touch_delay_minutes if settings else 1440
+
+    # Старые таблицы первого и второго касания превращаются в шаги 1 и 2 цепочки
+    first_touch_message = Message.objects.filter(is_second_touch=False).first()
+    second_touch_message = Message.objects.filter(is_second_touch=True).first()
+    steps = {}
+    if first_touch_message:
+        steps[1] = TouchStep.objects.create(
+            step=1, message=first_touch_message, delay_minutes=0, skip_if_responded=False
+        )
+    if second_touch_message:
+        steps[2] = TouchStep.objects.create(
+            step=2, message=second_touch_message, delay_minutes=second_touch_delay_minutes, skip_if_responded=True
+        )
+
+    for step_number, model in ((1, FirstTouchSchedule), (2, SecondTouchSchedule)):
+        if model.objects.exists() and step_number not in steps:
+            steps[step_number] = TouchStep.objects.create(
+                step=step_number,
+                message=model.objects.first().message,
+                delay_minutes=0 if step_number == 1 else second_touch_delay_minutes,
+                skip_if_responded=step_number != 1
+            )
+
+        touches = []
+        for schedule in model.objects.iterator(chunk_size=2000):
+            touches.append(TouchSchedule(
+                user_id=schedule.user_id,
+                step=steps[step_number],
+                message_id=schedule.message_id,
+                scheduled_time=schedule.scheduled_time,
+                original_scheduled_time=schedule.original_scheduled_time,
+                sent=schedule.sent,
+            ))
+            if len(touches) >= 2000:
+                TouchSchedule.objects.bulk_create(touches)
+                touches = []
+        TouchSchedule.objects.bulk_create(touches)
+
+
+def create_notify_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for table in ('bots_touchschedule', 'bots_touchstep'):
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_notify_scheduler "
+            f"AFTER INSERT OR UPDATE ON {table} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION bots_notify_scheduler();"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0008_settings_rate_limits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TouchStep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step', models.PositiveIntegerField(unique=True, verbose_name='Номер касания')),
+                ('delay_minutes', models.PositiveIntegerField(default=0, verbose_name='Задержка после предыдущего касания (минуты)')),
+                ('skip_if_responded', models.BooleanField(default=True, verbose_name='Не отправлять, если пользователь ответил')),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bots.message', verbose_name='Сообщение')),
+            ],
+            options={
+                'verbose_name': 'Шаг цепочки касаний',
+                'verbose_name_plural': 'Цепочка касаний',
+                'ordering': ['step'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TouchSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scheduled_time', models.DateTimeField(verbose_name='Время добавления')),
+                ('original_scheduled_time', models.DateTimeField(blank=True, null=True, verbose_name='Изначальное время добавления')),
+                ('sent', models.BooleanField(default=False, verbose_name='Отправлено')),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bots.message', verbose_name='Сообщение')),
+                ('step', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='bots.touchstep', verbose_name='Шаг')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bots.user', verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Касание',
+                'verbose_name_plural': 'Касания',
+                'indexes': [
+                    models.Index(condition=models.Q(('sent', False)), fields=['scheduled_time'], name='bots_touch_unsent_time_idx'),
+                    models.Index(fields=['user', 'sent'], name='bots_touch_user_sent_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(copy_touches_to_sequence, migrations.RunPython.noop),
+        migrations.RunPython(create_notify_trigger, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='FirstTouchSchedule',
+        ),
+        migrations.DeleteModel(
+            name='SecondTouchSchedule',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_second_touch',
+        ),
+        migrations.RemoveField(
+            model_name='settings',
+            name='second_touch_delay_minutes',
+        ),
+        migrations.AlterField(
+            model_name='settings',
+            name='dispatch_batch_size',
+            field=models.PositiveIntegerField(default=2, verbose_name='Максимум отправок бота за проход'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+def cancel_answered_touches(apps, schema_editor):
+    TouchSchedule = apps.get_model('bots', 'TouchSchedule')
+    TouchSchedule.objects.filter(
+        sent=False, step__skip_if_responded=True, user__responded=True
+    ).update(cancelled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0009_touch_sequence'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='touchschedule',
+            name='bots_touch_unsent_time_idx',
+        ),
+        migrations.AddField(
+            model_name='touchschedule',
+            name='cancelled',
+            field=models.BooleanField(default=False, verbose_name='Отменено'),
+        ),
+        migrations.AddIndex(
+            model_name='touchschedule',
+            index=models.Index(condition=models.Q(('cancelled', False), ('sent', False)), fields=['scheduled_time'], name='bots_touch_pending_time_idx'),
+        ),
+        migrations.RunPython(cancel_answered_touches, migrations.RunPython.noop),
+    ]
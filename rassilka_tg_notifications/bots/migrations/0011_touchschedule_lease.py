@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0010_touchschedule_cancelled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='touchschedule',
+            name='claimed_by',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Захвачено обработчиком'),
+        ),
+        migrations.AddField(
+            model_name='touchschedule',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Захват действует до'),
+        ),
+    ]
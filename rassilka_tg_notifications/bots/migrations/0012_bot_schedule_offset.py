@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-18 16:09
+
+import datetime
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def restore_shifted_touches(apps, schema_editor):
+    # Bans used to push unsent rows back and keep their time here; the offset set below now does that shift.
+    TouchSchedule = apps.get_model('bots', 'TouchSchedule')
+    TouchSchedule.objects.filter(sent=False, original_scheduled_time__isnull=False).update(
+        scheduled_time=F('original_scheduled_time')
+    )
+
+
+def offset_frozen_bots(apps, schema_editor):
+    # Bots banned right now would otherwise send everything that came due during the ban back-to-back.
+    Bot = apps.get_model('bots', 'Bot')
+    now = timezone.now()
+    for bot in Bot.objects.filter(is_banned=True, banned_until__gt=now):
+        bot.schedule_offset = bot.banned_until - now
+        bot.save(update_fields=['schedule_offset'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0011_touchschedule_lease'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_shifted_touches, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='touchschedule',
+            name='original_scheduled_time',
+        ),
+        migrations.AddField(
+            model_name='bot',
+            name='schedule_offset',
+            field=models.DurationField(default=datetime.timedelta(0), verbose_name='Сдвиг расписания после банов'),
+        ),
+        migrations.RunPython(offset_frozen_bots, migrations.RunPython.noop),
+    ]
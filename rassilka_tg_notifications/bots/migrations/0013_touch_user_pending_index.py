@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0012_bot_schedule_offset'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='touchschedule',
+            name='bots_touch_user_sent_idx',
+        ),
+        migrations.AddIndex(
+            model_name='touchschedule',
+            index=models.Index(condition=models.Q(('cancelled', False), ('sent', False)), fields=['user'], name='bots_touch_user_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 16:12
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0013_touch_user_pending_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='settings',
+            name='max_sends_per_minute',
+            field=models.FloatField(default=1.0, validators=[django.core.validators.MinValueValidator(0.01)], verbose_name='Максимум сообщений в минуту (на бота)'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 20:40
+
+import datetime
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def record_current_bans(apps, schema_editor):
+    # How much of the offset the current ban added is unknown for bans placed before this field, so let an early
+    # unban take back at most the whole offset, as it could before.
+    Bot = apps.get_model('bots', 'Bot')
+    for bot in Bot.objects.filter(is_banned=True, banned_until__gt=timezone.now()):
+        bot.ban_offset = bot.schedule_offset
+        bot.save(update_fields=['ban_offset'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0014_settings_rate_min'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bot',
+            name='ban_offset',
+            field=models.DurationField(default=datetime.timedelta(0), editable=False, verbose_name='Сдвиг от текущего бана'),
+        ),
+        migrations.RunPython(record_current_bans, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,11 @@
+import logging
+from datetime import timedelta
+from django.core.validators import MinValueValidator
 from django.db import models
+from bots.ratelimit import MIN_RATE_PER_MINUTE
 from django.utils import timezone
-from datetime import timedelta, timezone as dt_timezone
+
+logger = logging.getLogger(__name__)
 
 
 class PendingUser(models.Model):
@@ -13,6 +18,9 @@ class PendingUser(models.Model):
         verbose_name = "Пользователь в очереди"
         verbose_name_plural = "Пользователи в очереди"
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['created_at'], condition=models.Q(is_processed=False), name='bots_pending_unprocessed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.telegram_id})"
@@ -23,6 +31,7 @@ class User(models.Model):
     name = models.CharField(max_length=100, blank=True, verbose_name="Имя")
     responded = models.BooleanField(default=False, verbose_name="Ответил")
     last_message_time = models.DateTimeField(null=True, blank=True, verbose_name="Время последнего сообщения")
+    bot = models.ForeignKey('Bot', on_delete=models.SET_NULL, null=True, blank=True, related_name='users', verbose_name="Бот")
 
     class Meta:
         verbose_name = "Пользователь"
@@ -32,9 +41,26 @@ class User(models.Model):
         return f"{self.name} ({self.telegram_id})"
 
 
+class ResolvedPeer(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='resolved_peers', verbose_name="Пользователь")
+    session = models.CharField(max_length=100, verbose_name="Сессия")
+    peer_id = models.BigIntegerField(verbose_name="ID в Telegram")
+    access_hash = models.BigIntegerField(verbose_name="Access hash")
+    resolved_at = models.DateTimeField(auto_now=True, verbose_name="Время получения")
+
+    class Meta:
+        verbose_name = "Найденный пир"
+        verbose_name_plural = "Найденные пиры"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'session'], name='bots_resolvedpeer_user_session_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} -> {self.peer_id} ({self.session})"
+
+
 class Message(models.Model):
     text = models.TextField(verbose_name="Текст сообщения")
-    is_second_touch = models.BooleanField(default=False, verbose_name="Второе касание")
 
     class Meta:
         verbose_name = "Сообщение"
@@ -44,41 +70,52 @@ class Message(models.Model):
         return self.text[:50]
 
 
-class FirstTouchSchedule(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Пользователь")
+class TouchStep(models.Model):
+    step = models.PositiveIntegerField(unique=True, verbose_name="Номер касания")
     message = models.ForeignKey(Message, on_delete=models.CASCADE, verbose_name="Сообщение")
-    scheduled_time = models.DateTimeField(verbose_name="Время добавления")
-    original_scheduled_time = models.DateTimeField(null=True, blank=True, verbose_name="Изначальное время добавления")
-    sent = models.BooleanField(default=False, verbose_name="Отправлено")
+    delay_minutes = models.PositiveIntegerField(default=0, verbose_name="Задержка после предыдущего касания (минуты)")
+    skip_if_responded = models.BooleanField(default=True, verbose_name="Не отправлять, если пользователь ответил")
 
     class Meta:
-        verbose_name = "Первое касание"
-        verbose_name_plural = "Первые касания"
+        verbose_name = "Шаг цепочки касаний"
+        verbose_name_plural = "Цепочка касаний"
+        ordering = ['step']
 
     def __str__(self):
-        return f"Первое касание для {self.user} на {self.scheduled_time}"
+        return f"Касание №{self.step}"
 
 
-class SecondTouchSchedule(models.Model):
+class TouchSchedule(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Пользователь")
+    step = models.ForeignKey(TouchStep, on_delete=models.CASCADE, related_name='schedules', verbose_name="Шаг")
     message = models.ForeignKey(Message, on_delete=models.CASCADE, verbose_name="Сообщение")
     scheduled_time = models.DateTimeField(verbose_name="Время добавления")
-    original_scheduled_time = models.DateTimeField(null=True, blank=True, verbose_name="Изначальное время добавления")
     sent = models.BooleanField(default=False, verbose_name="Отправлено")
+    cancelled = models.BooleanField(default=False, verbose_name="Отменено")
+    claimed_by = models.CharField(max_length=100, blank=True, default='', verbose_name="Захвачено обработчиком")
+    lease_expires_at = models.DateTimeField(null=True, blank=True, verbose_name="Захват действует до")
 
     class Meta:
-        verbose_name = "Второе касание"
-        verbose_name_plural = "Вторые касания"
+        verbose_name = "Касание"
+        verbose_name_plural = "Касания"
+        indexes = [
+            models.Index(fields=['scheduled_time'], condition=models.Q(sent=False, cancelled=False), name='bots_touch_pending_time_idx'),
+            models.Index(fields=['user'], condition=models.Q(sent=False, cancelled=False), name='bots_touch_user_pending_idx'),
+        ]
 
     def __str__(self):
-        return f"Второе касание для {self.user} на {self.scheduled_time}"
+        return f"{self.step} для {self.user} на {self.scheduled_time}"
 
 
 class Settings(models.Model):
     message_interval_minutes = models.IntegerField(default=6, verbose_name="Интервал между сообщениями (минуты)")
     ban_freeze_minutes = models.IntegerField(default=60, verbose_name="Заморозка после бана (минуты)")
-    second_touch_delay_minutes = models.IntegerField(default=1440, verbose_name="Задержка второго касания (минуты)")
     admin_telegram_id = models.CharField(max_length=50, blank=True, null=True, verbose_name="Telegram ID админа")
+    dispatch_batch_size = models.PositiveIntegerField(default=2, verbose_name="Максимум отправок бота за проход")
+    send_burst = models.PositiveIntegerField(default=3, verbose_name="Сообщений подряд без паузы (на бота)")
+    max_sends_per_minute = models.FloatField(
+        default=1.0, validators=[MinValueValidator(MIN_RATE_PER_MINUTE)], verbose_name="Максимум сообщений в минуту (на бота)"
+    )
 
     class Meta:
         verbose_name = "Настройка"
@@ -92,6 +129,15 @@ class Bot(models.Model):
     name = models.CharField(max_length=100, default="Main Bot", verbose_name="Имя бота")
     is_banned = models.BooleanField(default=False, verbose_name="Забанен")
     banned_until = models.DateTimeField(null=True, blank=True, verbose_name="Забанен до")
+    session_name = models.CharField(max_length=100, unique=True, default="sender", verbose_name="Файл сессии")
+    is_active = models.BooleanField(default=True, verbose_name="Активен")
+    message_interval_minutes = models.IntegerField(null=True, blank=True, verbose_name="Интервал между сообщениями (минуты)")
+    schedule_offset = models.DurationField(default=timedelta(0), verbose_name="Сдвиг расписания после банов")
+    ban_offset = models.DurationField(default=timedelta(0), editable=False, verbose_name="Сдвиг от текущего бана")
+
+    # The only fields dispatchers write. They work on cached copies of the row, so saving every field would
+    # put back whatever an admin changed since the copy was loaded.
+    BAN_FIELDS = ['is_banned', 'banned_until', 'schedule_offset', 'ban_offset']
 
     class Meta:
         verbose_name = "Бот"
@@ -100,83 +146,67 @@ class Bot(models.Model):
     def __str__(self):
         return self.name
 
-    def save(self, *args, **kwargs):
-        settings = Settings.objects.first()
-        if not settings:
-            settings = Settings.objects.create()
+    def get_message_interval(self, settings):
+        return self.message_interval_minutes or settings.message_interval_minutes
+
+    def ban_windows(self):
+        if self.is_banned and self.banned_until:
+            return [(None, self.banned_until)]
+        return []
+
+    def is_frozen(self, at=None):
+        at = at or timezone.now()
+        return bool(self.is_banned and self.banned_until and self.banned_until > at)
+
+    def effective_time(self, scheduled_time):
+        return scheduled_time + self.schedule_offset
+
+    def stored_time(self, effective_time):
+        return effective_time - self.schedule_offset
+
+    def freeze(self, duration, now=None):
+        # Unsent touches are due at scheduled_time + schedule_offset, so every ban pushes them all back at once.
+        now = now or timezone.now()
+        self.is_banned = True
+        self.banned_until = now + duration
+        self.schedule_offset += duration
+        self.ban_offset += duration
+
+    def ban_for(self, duration):
+        self.refresh_from_db(fields=self.BAN_FIELDS)
+        self.freeze(duration)
+        self.save(update_fields=self.BAN_FIELDS)
+
+    def lift_expired_ban(self, now=None):
+        """Reset is_banned once banned_until has passed. Returns whether this call lifted it."""
+        self.refresh_from_db(fields=self.BAN_FIELDS)
+        if not self.is_banned or self.is_frozen(now):
+            return False
+        self.is_banned = False
+        self.save(update_fields=self.BAN_FIELDS)
+        return True
 
+    def save(self, *args, **kwargs):
         now = timezone.now()
 
         if self.is_banned and not self.banned_until:
-            self.banned_until = now + timezone.timedelta(minutes=settings.ban_freeze_minutes)
-            print(f"Bot banned until {self.banned_until}")
-
-            for schedule in FirstTouchSchedule.objects.filter(sent=False):
-                if not schedule.original_scheduled_time:
-                    schedule.original_scheduled_time = schedule.scheduled_time
-                new_time = schedule.scheduled_time + timezone.timedelta(minutes=settings.ban_freeze_minutes)
-                adjusted_time = adjust_time_to_working_hours(new_time, settings)
-                schedule.scheduled_time = adjusted_time
-                schedule.save()
-                print(f"First touch for {schedule.user} rescheduled from {schedule.original_scheduled_time} to {schedule.scheduled_time}")
-
-            for schedule in SecondTouchSchedule.objects.filter(sent=False):
-                if not schedule.original_scheduled_time:
-                    schedule.original_scheduled_time = schedule.scheduled_time
-                new_time = schedule.scheduled_time + timezone.timedelta(minutes=settings.ban_freeze_minutes)
-                adjusted_time = adjust_time_to_working_hours(new_time, settings)
-                schedule.scheduled_time = adjusted_time
-                schedule.save()
-                print(f"Second touch for {schedule.user} rescheduled from {schedule.original_scheduled_time} to {schedule.scheduled_time}")
+            from bots.config import get_settings
 
-        elif not self.is_banned and self.banned_until:
-            print(f"Bot ban removed at {now}")
-            self.banned_until = None
+            settings = get_settings()
+            self.freeze(timedelta(minutes=settings.ban_freeze_minutes), now)
+            logger.warning("Bot %s banned until %s, unsent schedules are shifted by %s", self.name, self.banned_until, self.schedule_offset)
 
-            for schedule in FirstTouchSchedule.objects.filter(sent=False):
-                if schedule.original_scheduled_time:
-                    schedule.scheduled_time = schedule.original_scheduled_time
-                    schedule.original_scheduled_time = None
-                    schedule.save()
-                    print(f"First touch for {schedule.user} restored to {schedule.scheduled_time}")
+        elif self.is_banned and not self.ban_offset and self.banned_until > now:
+            # Banned by hand with an explicit end time.
+            self.freeze(self.banned_until - now, now)
+            logger.warning("Bot %s banned until %s, unsent schedules are shifted by %s", self.name, self.banned_until, self.schedule_offset)
 
-            for schedule in SecondTouchSchedule.objects.filter(sent=False):
-                if schedule.original_scheduled_time:
-                    schedule.scheduled_time = schedule.original_scheduled_time
-                    schedule.original_scheduled_time = None
-                    schedule.save()
-                    print(f"Second touch for {schedule.user} restored to {schedule.scheduled_time}")
+        elif not self.is_banned and self.banned_until:
+            if self.banned_until > now:
+                # Lifted early: take back the unserved part, but never offset left over from earlier bans.
+                self.schedule_offset -= min(self.banned_until - now, self.ban_offset)
+            logger.info("Bot %s ban removed at %s, schedule offset is %s", self.name, now, self.schedule_offset)
+            self.banned_until = None
+            self.ban_offset = timedelta(0)
 
         super().save(*args, **kwargs)
-
-
-def adjust_time_to_working_hours(scheduled_time, settings):
-    local_time = timezone.localtime(scheduled_time)
-    while True:
-        conflicting_first = FirstTouchSchedule.objects.filter(
-            sent=False,
-            scheduled_time__range=(
-                local_time - timedelta(minutes=1),
-                local_time + timedelta(minutes=1)
-            )
-        ).exists()
-        conflicting_second = SecondTouchSchedule.objects.filter(
-            sent=False,
-            scheduled_time__range=(
-                local_time - timedelta(minutes=1),
-                local_time + timedelta(minutes=1)
-            )
-        ).exists()
-
-        if not conflicting_first and not conflicting_second:
-            break
-
-        local_time += timedelta(minutes=settings.message_interval_minutes)
-
-    current_hour = local_time.hour
-    if current_hour < 11:
-        local_time = local_time.replace(hour=11, minute=0, second=0, microsecond=0)
-    elif current_hour >= 21:
-        local_time = (local_time + timedelta(days=1)).replace(hour=11, minute=0, second=0, microsecond=0)
-
-    return local_time.astimezone(dt_timezone.utc)
@@ -0,0 +1,102 @@
+import time
+import select
+import asyncio
+import logging
+from asgiref.sync import sync_to_async
+from django.db import connection
+
+SCHEDULER_CHANNEL = 'bots_scheduler'
+RECONNECT_DELAY_SECONDS = 5
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerNotifier:
+    def __init__(self, channel=SCHEDULER_CHANNEL):
+        self.channel = channel
+        self._conn = None
+
+    @property
+    def enabled(self):
+        return connection.vendor == 'postgresql'
+
+    def _connect(self):
+        if self._conn is None or self._conn.closed:
+            conn = connection.get_new_connection(connection.get_connection_params())
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {self.channel}')
+            self._conn = conn
+            logger.info("Listening for scheduler notifications on '%s'", self.channel)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+        self._conn = None
+
+    def _collect(self, conn):
+        from bots.config import invalidate_from_notifications
+
+        conn.poll()
+        payloads = [notify.payload for notify in conn.notifies]
+        conn.notifies.clear()
+        # Settings and bot rows changed by other processes must not wait for the config cache TTL here.
+        invalidate_from_notifications(payloads)
+        return payloads
+
+    def drain(self):
+        if not self.enabled:
+            return []
+        try:
+            return self._collect(self._connect())
+        except (OSError, connection.Database.Error) as e:
+            logger.warning("Error reading scheduler notifications: %s", e)
+            self.close()
+            return []
+
+    def wait(self, timeout):
+        if not self.enabled:
+            time.sleep(timeout)
+            return []
+
+        try:
+            conn = self._connect()
+            payloads = self._collect(conn)
+            if payloads:
+                return payloads
+            if select.select([conn], [], [], timeout) != ([], [], []):
+                return self._collect(conn)
+            return []
+        except (OSError, connection.Database.Error) as e:
+            logger.warning("Error waiting for scheduler notifications: %s, falling back to sleep", e)
+            self.close()
+            time.sleep(min(timeout, RECONNECT_DELAY_SECONDS))
+            return []
+
+    async def wait_async(self, timeout):
+        if not self.enabled:
+            await asyncio.sleep(timeout)
+            return []
+
+        loop = asyncio.get_running_loop()
+        try:
+            conn = await sync_to_async(self._connect, thread_sensitive=False)()
+            payloads = self._collect(conn)
+            if payloads:
+                return payloads
+
+            readable = loop.create_future()
+            loop.add_reader(conn.fileno(), lambda: readable.done() or readable.set_result(None))
+            try:
+                await asyncio.wait_for(readable, timeout)
+            except asyncio.TimeoutError:
+                return []
+            finally:
+                loop.remove_reader(conn.fileno())
+            return self._collect(conn)
+        except (OSError, connection.Database.Error) as e:
+            logger.warning("Error waiting for scheduler notifications: %s, falling back to sleep", e)
+            self.close()
+            await asyncio.sleep(min(timeout, RECONNECT_DELAY_SECONDS))
+            return []
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+from threading import Lock
+from .models import ResolvedPeer
+
+PEER_CACHE_SIZE = 10000
+
+
+class PeerCache:
+    def __init__(self, maxsize=PEER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def _remember(self, key, peer):
+        with self._lock:
+            self._entries[key] = peer
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, user_id, session):
+        key = (session, user_id)
+        with self._lock:
+            peer = self._entries.get(key)
+            if peer is not None:
+                self._entries.move_to_end(key)
+                return peer
+
+        peer = ResolvedPeer.objects.filter(
+            user_id=user_id, session=session
+        ).values_list('peer_id', 'access_hash').first()
+        if peer is not None:
+            self._remember(key, peer)
+        return peer
+
+    def store(self, user_id, session, peer_id, access_hash):
+        ResolvedPeer.objects.update_or_create(
+            user_id=user_id,
+            session=session,
+            defaults={'peer_id': peer_id, 'access_hash': access_hash}
+        )
+        self._remember((session, user_id), (peer_id, access_hash))
+
+    def invalidate(self, user_id, session):
+        with self._lock:
+            self._entries.pop((session, user_id), None)
+        ResolvedPeer.objects.filter(user_id=user_id, session=session).delete()
+
+
+peer_cache = PeerCache()
@@ -0,0 +1,101 @@
+import time
+from threading import Lock
+
+BACKOFF_FACTOR = 0.5
+RAMP_UP_FACTOR = 1.1
+RAMP_UP_AFTER_SUCCESSES = 10
+MIN_RATE_FRACTION = 0.1
+# Zero would divide by zero in wait_time and a negative rate would make every wait negative, i.e. unlimited.
+MIN_RATE_PER_MINUTE = 0.01
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst):
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.successes = 0
+        # Fraction of the configured maximum this bucket runs at; below 1 only after FloodWait errors.
+        self.backoff = 1.0
+
+    def set_rate(self, max_rate_per_minute):
+        # Account for the time elapsed so far at the old rate before switching.
+        self._refill(time.monotonic())
+        self.rate_per_minute = max_rate_per_minute * self.backoff
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.tokens = min(float(self.burst), self.tokens + elapsed * self.rate_per_minute / 60)
+        self.updated_at = now
+
+    def wait_time(self):
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * 60 / self.rate_per_minute
+
+    def take(self):
+        self.tokens -= 1
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, burst=1, max_rate_per_minute=1.0):
+        self.burst = burst
+        self.max_rate_per_minute = max_rate_per_minute
+        self._buckets = {}
+        self._lock = Lock()
+
+    def configure(self, burst, max_rate_per_minute):
+        burst = max(int(burst), 1)
+        max_rate_per_minute = max(max_rate_per_minute, MIN_RATE_PER_MINUTE)
+        with self._lock:
+            self.burst = burst
+            self.max_rate_per_minute = max_rate_per_minute
+            for bucket in self._buckets.values():
+                bucket.burst = burst
+                bucket.set_rate(max_rate_per_minute)
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.max_rate_per_minute, self.burst)
+        return bucket
+
+    def wait_time(self, key):
+        with self._lock:
+            return self._bucket(key).wait_time()
+
+    def try_acquire(self, key):
+        with self._lock:
+            bucket = self._bucket(key)
+            wait = bucket.wait_time()
+            if wait <= 0:
+                bucket.take()
+            return wait
+
+    def on_success(self, key):
+        with self._lock:
+            bucket = self._bucket(key)
+            bucket.successes += 1
+            if bucket.successes >= RAMP_UP_AFTER_SUCCESSES and bucket.backoff < 1:
+                bucket.backoff = min(1.0, bucket.backoff * RAMP_UP_FACTOR)
+                bucket.set_rate(self.max_rate_per_minute)
+                bucket.successes = 0
+
+    def on_flood_wait(self, key, seconds):
+        with self._lock:
+            bucket = self._bucket(key)
+            bucket.backoff = max(MIN_RATE_FRACTION, bucket.backoff * BACKOFF_FACTOR)
+            bucket.set_rate(self.max_rate_per_minute)
+            bucket.tokens = 0.0
+            bucket.successes = 0
+            bucket.blocked_until = time.monotonic() + seconds
+            return bucket.rate_per_minute
+
+
+rate_limiter = AdaptiveRateLimiter()
@@ -1,233 +1,459 @@
 import os
 import time
-from threading import Thread, Lock
-from datetime import timezone
+import socket
+import logging
+from datetime import timedelta
+from threading import Thread, Lock, current_thread
+from concurrent.futures import ThreadPoolExecutor
 from django.utils import timezone as django_timezone
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from bots import metrics
+from bots.config import get_bots, get_settings
+from bots.leader import LeaderElection, STANDBY_POLL_SECONDS
+from bots.notify import SchedulerNotifier
+from bots.ratelimit import rate_limiter
+from bots.slots import SlotAllocator, WORKING_HOURS_START, WORKING_HOURS_END
+
+IDLE_WAIT_SECONDS = 180
+BULK_BATCH_SIZE = 1000
+PENDING_USERS_CHUNK_SIZE = 500
+# A claimed batch must be sent within the lease, otherwise another dispatcher may take it over.
+CLAIM_LEASE_SECONDS = 600
+
+logger = logging.getLogger(__name__)
 
 scheduler_lock = Lock()
 
 
-def process_schedules():
-    from bots.models import FirstTouchSchedule, SecondTouchSchedule, Settings
+def pending_touches():
+    from bots.models import TouchSchedule
+
+    return TouchSchedule.objects.filter(sent=False, cancelled=False).filter(
+        Q(step__skip_if_responded=False) | Q(user__responded=False)
+    )
+
+
+def unsent_touches_for(telegram_ids):
+    from bots.models import TouchSchedule
+
+    return TouchSchedule.objects.filter(user__telegram_id__in=telegram_ids, sent=False, cancelled=False)
+
+
+def cancel_followups(telegram_ids):
+    return unsent_touches_for(telegram_ids).filter(step__skip_if_responded=True).update(cancelled=True)
+
+
+def pending_users_queue():
+    from bots.models import PendingUser
+
+    return PendingUser.objects.filter(is_processed=False).order_by('created_at')
+
+
+def update_queue_depth():
+    depth = pending_touches().values('step__step').annotate(count=Count('id')).values_list('step__step', 'count')
+    metrics.queue_depth.replace([({'step': step}, count) for step, count in depth])
+
+
+def dispatcher_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{current_thread().name}"[:100]
+
+
+def unclaimed(now):
+    return Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now)
+
+
+def due_touches(bot, now, claimed_at):
+    return pending_touches().filter(
+        unclaimed(claimed_at),
+        user__bot=bot,
+        scheduled_time__lte=bot.stored_time(now)
+    ).order_by('scheduled_time').select_for_update(skip_locked=True, of=('self',))
+
+
+def upcoming_touches(bot, now):
+    return pending_touches().filter(
+        user__bot=bot,
+        scheduled_time__gt=bot.stored_time(now)
+    ).order_by('scheduled_time')
+
+
+def leased_touches(bots, now):
+    return pending_touches().filter(user__bot__in=bots, lease_expires_at__gt=now).order_by('lease_expires_at')
+
+
+def claim_due_schedules(bot, now, batch_size, claimed_by):
+    """Lease the earliest due touches of a bot, skipping rows locked or leased by other dispatchers."""
+    from bots.models import TouchSchedule
+
+    claimed_at = django_timezone.now()
+    with transaction.atomic():
+        schedule_ids = list(due_touches(bot, now, claimed_at).values_list('id', flat=True)[:batch_size])
+        if not schedule_ids:
+            return []
+        TouchSchedule.objects.filter(id__in=schedule_ids).update(
+            claimed_by=claimed_by,
+            lease_expires_at=claimed_at + timedelta(seconds=CLAIM_LEASE_SECONDS)
+        )
+
+    return list(
+        TouchSchedule.objects.select_related('user', 'message', 'step').filter(id__in=schedule_ids).order_by('scheduled_time')
+    )
+
+
+def release_claims(schedule_ids, claimed_by):
+    from bots.models import TouchSchedule
+
+    if schedule_ids:
+        TouchSchedule.objects.filter(id__in=schedule_ids, claimed_by=claimed_by, sent=False).update(
+            claimed_by='', lease_expires_at=None
+        )
+
+
+def finish_claims(schedules, sent_ids, claimed_by):
+    mark_sent(sent_ids)
+    sent_ids = set(sent_ids)
+    release_claims([schedule.id for schedule in schedules if schedule.id not in sent_ids], claimed_by)
+
+
+def mark_sent(schedule_ids):
+    from bots.models import TouchSchedule
+
+    if schedule_ids:
+        TouchSchedule.objects.filter(id__in=schedule_ids).update(sent=True, lease_expires_at=None)
+
+
+def acquire_send_slot(bot, take=True):
+    if bot.is_frozen():
+        logger.warning("Bot %s is banned until %s, stopping batch", bot.name, bot.banned_until)
+        return False, None
+
+    wait = rate_limiter.try_acquire(bot.session_name) if take else rate_limiter.wait_time(bot.session_name)
+    if wait > 0:
+        logger.debug("Rate limit reached for bot %s, deferring batch for %.2f seconds", bot.name, wait)
+        return False, wait
+
+    return True, None
+
+
+def can_claim(bot):
+    # Claiming and releasing rows fires the bots_touchschedule NOTIFY, which would wake the scheduler straight
+    # back up while it waits out the rate limit, so only claim when at least one send can go out.
+    return acquire_send_slot(bot, take=False)
+
+
+def dispatch_due_schedules(now, bot, batch_size):
     from bots.tasks import send_message
 
-    now = django_timezone.localtime(django_timezone.now())
-    current_hour = now.hour
-    settings = Settings.objects.first() or Settings.objects.create()
-    print(f"Checking schedules at {now} (local time) with message_interval_minutes={settings.message_interval_minutes}")
-
-    if 11 <= current_hour < 21:
-        first_touch = FirstTouchSchedule.objects.filter(
-            sent=False,
-            scheduled_time__lte=now
-        ).order_by('scheduled_time').first()
-
-        if first_touch:
-            print(f"Processing first touch for user {first_touch.user.telegram_id}")
-            success = send_message(first_touch)
-            if success:
-                first_touch.sent = True
-                first_touch.save()
-                print(f"First touch for user {first_touch.user.telegram_id} processed successfully")
-            else:
-                print(f"Failed to process first touch for user {first_touch.user.telegram_id}")
+    allowed, wait = can_claim(bot)
+    if not allowed:
+        return [], wait
 
-        second_touch = SecondTouchSchedule.objects.filter(
-            sent=False,
-            scheduled_time__lte=now
-        ).order_by('scheduled_time').first()
+    claimed_by = dispatcher_id()
+    due_schedules = claim_due_schedules(bot, now, batch_size, claimed_by)
 
-        if second_touch:
-            print(f"Processing second touch for user {second_touch.user.telegram_id}")
-            success = send_message(second_touch)
+    sent_ids = []
+    retry_in = 0 if len(due_schedules) == batch_size else None
+    try:
+        for schedule in due_schedules:
+            allowed, wait = acquire_send_slot(bot)
+            if not allowed:
+                retry_in = wait
+                break
+
+            logger.debug("Processing touch #%s for user %s via %s", schedule.step.step, schedule.user.telegram_id, bot.name)
+            success = send_message(schedule, bot=bot)
             if success:
-                second_touch.sent = True
-                second_touch.save()
-                print(f"Second touch for user {second_touch.user.telegram_id} processed successfully")
+                sent_ids.append(schedule.id)
+                logger.debug("Touch #%s for user %s processed successfully", schedule.step.step, schedule.user.telegram_id)
             else:
-                print(f"Failed to process second touch for user {second_touch.user.telegram_id}")
+                logger.warning("Failed to process touch #%s for user %s", schedule.step.step, schedule.user.telegram_id)
+    finally:
+        finish_claims(due_schedules, sent_ids, claimed_by)
+
+    return due_schedules, retry_in
+
+
+def earliest_retry(*retry_times):
+    retry_times = [retry_in for retry_in in retry_times if retry_in is not None]
+    return min(retry_times) if retry_times else None
+
+
+def dispatch_for_bot(bot, now, batch_size):
+    try:
+        due_schedules, retry_in = dispatch_due_schedules(now, bot, batch_size)
+        return len(due_schedules), retry_in
+    finally:
+        connection.close()
+
+
+def get_dispatch_bots(now):
+    bots = []
+    for bot in get_bots():
+        metrics.bot_banned.set(int(bot.is_frozen(now)), session=bot.session_name)
+        if bot.is_frozen(now):
+            logger.warning("Bot %s is banned until %s, its schedules are frozen", bot.name, bot.banned_until)
+            continue
+        if bot.is_banned and bot.lift_expired_ban(now):
+            logger.info("Ban period ended for bot %s at %s. Reset is_banned to False.", bot.name, now)
+        if not bot.is_frozen(now):
+            bots.append(bot)
+    return bots
 
-        if not first_touch and not second_touch:
-            print("No schedules to process at this time")
-    else:
-        print("Outside working hours (11:00–19:00), skipping schedule processing")
+
+def prepare_dispatch():
+    now = django_timezone.localtime(django_timezone.now())
+    current_hour = now.hour
+    settings = get_settings()
+    batch_size = max(settings.dispatch_batch_size, 1)
+    rate_limiter.configure(settings.send_burst, settings.max_sends_per_minute)
+    logger.debug("Checking schedules at %s (local time) with message_interval_minutes=%s, dispatch_batch_size=%s", now, settings.message_interval_minutes, batch_size)
+
+    if not WORKING_HOURS_START <= current_hour < WORKING_HOURS_END:
+        logger.debug("Outside working hours (%s:00–%s:00), skipping schedule processing", WORKING_HOURS_START, WORKING_HOURS_END)
+        return now, batch_size, []
+
+    bots = get_dispatch_bots(now)
+    if not bots:
+        logger.warning("No active bots available for dispatch")
+    return now, batch_size, bots
+
+
+def summarize_dispatch(results):
+    if not any(processed for processed, _ in results):
+        logger.debug("No schedules to process at this time")
+    return earliest_retry(*(retry_in for _, retry_in in results))
+
+
+def process_schedules():
+    now, batch_size, bots = prepare_dispatch()
+    if not bots:
+        return None
+
+    with ThreadPoolExecutor(max_workers=len(bots), thread_name_prefix='dispatch') as executor:
+        results = list(executor.map(lambda bot: dispatch_for_bot(bot, now, batch_size), bots))
+
+    return summarize_dispatch(results)
 
 
 def process_pending_users():
-    from bots.models import PendingUser, User, Settings, FirstTouchSchedule, SecondTouchSchedule, Message, Bot
+    from bots.models import PendingUser, User, TouchSchedule, TouchStep, Bot
+    from bots.utils import assign_bots
+    from django.db.models import Max
     from django.utils import timezone as django_timezone
     from datetime import timedelta
 
     now = django_timezone.localtime(django_timezone.now())
     current_hour = now.hour
-    settings = Settings.objects.first() or Settings.objects.create()
-    print(f"Checking pending users at {now} (local time) with message_interval_minutes={settings.message_interval_minutes}")
+    settings = get_settings()
+    logger.debug("Checking pending users at %s (local time) with message_interval_minutes=%s", now, settings.message_interval_minutes)
 
-    if current_hour < 11:
-        pending_users = PendingUser.objects.filter(is_processed=False).order_by('created_at')
+    if current_hour < WORKING_HOURS_START:
+        pending_users = pending_users_queue()
         if pending_users.exists():
-            print(f"Found {pending_users.count()} pending users, but it's before 11:00. Waiting...")
+            logger.debug("Found %s pending users, but it's before %s:00. Waiting...", pending_users.count(), WORKING_HOURS_START)
         else:
-            print("No pending users to process")
+            logger.debug("No pending users to process")
         return
 
     with scheduler_lock:
-        with transaction.atomic():
-            pending_users = PendingUser.objects.select_for_update().filter(is_processed=False).order_by('created_at')
-            if pending_users.exists():
-                first_touch_message = Message.objects.filter(is_second_touch=False).first()
-                second_touch_message = Message.objects.filter(is_second_touch=True).first()
-                if not first_touch_message or not second_touch_message:
-                    print("Messages not found, cannot schedule messages.")
-                    return
-
-                bot = Bot.objects.first() or Bot.objects.create(name="Main Bot")
-
-                last_first_touch = FirstTouchSchedule.objects.filter(sent=False).order_by('-scheduled_time').first()
-                last_second_touch = SecondTouchSchedule.objects.filter(sent=False).order_by('-scheduled_time').first()
-
-                base_time = django_timezone.now()
-                print(f"Base time (UTC): {base_time}")
-
-                for pending_user in pending_users:
-                    print(f"Processing pending user: {pending_user.telegram_id} ({pending_user.name}) at {now}")
-                    user = User.objects.filter(telegram_id=pending_user.telegram_id).first()
-
-                    existing_first_touch = FirstTouchSchedule.objects.filter(user__telegram_id=pending_user.telegram_id, sent=False).exists()
-                    existing_second_touch = SecondTouchSchedule.objects.filter(user__telegram_id=pending_user.telegram_id, sent=False).exists()
-
-                    if user and (existing_first_touch or existing_second_touch):
-                        print(f"User {pending_user.telegram_id} already has scheduled (unsent) touches, skipping.")
-                        pending_user.is_processed = True
-                        pending_user.save()
-                        continue
-
-                    user, created = User.objects.get_or_create(
-                        telegram_id=pending_user.telegram_id,
-                        defaults={'name': pending_user.name}
-                    )
-                    if created:
-                        print(f"User {user.telegram_id} created successfully")
-                    else:
-                        print(f"User {user.telegram_id} already exists")
-
-                    pending_user.is_processed = True
-                    pending_user.save()
-
-                    if not last_first_touch:
-                        first_touch_time = base_time + timedelta(minutes=2)
-                    else:
-                        last_first_touch_time = last_first_touch.scheduled_time
-                        first_touch_time = last_first_touch_time + timedelta(minutes=settings.message_interval_minutes)
-
-                    if bot.is_banned and bot.banned_until and bot.banned_until > first_touch_time:
-                        first_touch_time = bot.banned_until
-                        print(f"First touch time adjusted Cane to ban: {first_touch_time}")
-
-                    local_first_touch_time = django_timezone.localtime(first_touch_time)
-                    if local_first_touch_time.hour < 11:
-                        local_first_touch_time = local_first_touch_time.replace(hour=11, minute=0, second=0, microsecond=0)
-                        first_touch_time = local_first_touch_time.astimezone(timezone.utc)
-                    elif local_first_touch_time.hour >= 21:
-                        local_first_touch_time = (local_first_touch_time + timedelta(days=1)).replace(hour=11, minute=0, second=0, microsecond=0)
-                        first_touch_time = local_first_touch_time.astimezone(timezone.utc)
-
-                    while FirstTouchSchedule.objects.filter(
-                        sent=False,
-                        scheduled_time__range=(
-                            first_touch_time - timedelta(minutes=1),
-                            first_touch_time + timedelta(minutes=1)
-                        )
-                    ).exclude(user=user).exists():
-                        first_touch_time += timedelta(minutes=settings.message_interval_minutes)
-                        local_first_touch_time = django_timezone.localtime(first_touch_time)
-                        if local_first_touch_time.hour >= 21:
-                            local_first_touch_time = (local_first_touch_time + timedelta(days=1)).replace(hour=11, minute=0, second=0, microsecond=0)
-                            first_touch_time = local_first_touch_time.astimezone(timezone.utc)
-
-                    first_touch = FirstTouchSchedule.objects.create(
+        if not pending_users_queue().exists():
+            logger.debug("No pending users to process")
+            return
+
+        steps = list(TouchStep.objects.order_by('step'))
+        if not steps:
+            logger.warning("Touch sequence is empty, cannot schedule messages.")
+            return
+        first_step = steps[0]
+
+        if not Bot.objects.exists():
+            Bot.objects.create(name="Main Bot")
+        active_bots = Bot.objects.filter(is_active=True)
+        bots = {bot.id: bot for bot in active_bots}
+        if not bots:
+            logger.warning("No active bots found, cannot schedule messages.")
+            return
+
+        last_first_touch_times = dict(
+            TouchSchedule.objects.filter(
+                sent=False, cancelled=False, step=first_step, user__bot__in=active_bots
+            ).values('user__bot').annotate(last_time=Max('scheduled_time')).values_list('user__bot', 'last_time')
+        )
+        touch_slots = SlotAllocator.per_bot(TouchSchedule, bots.values(), settings)
+
+        base_time = django_timezone.now()
+        logger.debug("Base time (UTC): %s", base_time)
+
+        def schedule_chunk(pending_users):
+            telegram_ids = [pending_user.telegram_id for pending_user in pending_users]
+
+            users = {user.telegram_id: user for user in User.objects.filter(telegram_id__in=telegram_ids)}
+            scheduled_telegram_ids = set(unsent_touches_for(telegram_ids).values_list('user__telegram_id', flat=True))
+
+            new_users = [
+                User(telegram_id=pending_user.telegram_id, name=pending_user.name)
+                for pending_user in pending_users
+                if pending_user.telegram_id not in users
+            ]
+            reassigned_users = assign_bots(
+                [user for user in users.values() if user.telegram_id not in scheduled_telegram_ids] + new_users,
+                active_bots
+            )
+            User.objects.bulk_update([user for user in reassigned_users if user.pk], ['bot'], batch_size=BULK_BATCH_SIZE)
+            for user in User.objects.bulk_create(new_users, batch_size=BULK_BATCH_SIZE):
+                users[user.telegram_id] = user
+            logger.info("Created %s users, %s already existed", len(new_users), len(users) - len(new_users))
+
+            touches = []
+            scheduled_count = 0
+            for pending_user in pending_users:
+                user = users[pending_user.telegram_id]
+                if pending_user.telegram_id in scheduled_telegram_ids:
+                    logger.debug("User %s already has scheduled (unsent) touches, skipping.", pending_user.telegram_id)
+                    continue
+
+                bot = bots[user.bot_id]
+                last_first_touch_time = last_first_touch_times.get(bot.id)
+                if not last_first_touch_time:
+                    touch_time = base_time + timedelta(minutes=2)
+                else:
+                    touch_time = bot.effective_time(last_first_touch_time) + timedelta(minutes=bot.get_message_interval(settings))
+
+                for step in steps:
+                    if step is not first_step:
+                        touch_time += timedelta(minutes=step.delay_minutes)
+                    touch_time = touch_slots[bot.id].allocate(touch_time)
+                    touches.append(TouchSchedule(
                         user=user,
-                        message=first_touch_message,
-                        scheduled_time=first_touch_time
-                    )
-                    print(f"Scheduled first touch for {user.telegram_id} at {django_timezone.localtime(first_touch_time)} (local time) (ID: {first_touch.id})")
-
-                    if not last_second_touch:
-                        second_touch_time = first_touch_time + timedelta(minutes=settings.second_touch_delay_minutes)
-                    else:
-                        last_second_touch_time = last_second_touch.scheduled_time
-                        second_touch_time = last_second_touch_time + timedelta(minutes=settings.message_interval_minutes)
-
-                    if bot.is_banned and bot.banned_until and bot.banned_until > second_touch_time:
-                        second_touch_time = bot.banned_until
-                        print(f"Second touch time adjusted due to ban: {second_touch_time}")
-
-                    local_second_touch_time = django_timezone.localtime(second_touch_time)
-                    if local_second_touch_time.hour < 11:
-                        local_second_touch_time = local_second_touch_time.replace(hour=11, minute=0, second=0, microsecond=0)
-                        second_touch_time = local_second_touch_time.astimezone(timezone.utc)
-                    elif local_second_touch_time.hour >= 21:
-                        local_second_touch_time = (local_second_touch_time + timedelta(days=1)).replace(hour=11, minute=0, second=0, microsecond=0)
-                        second_touch_time = local_second_touch_time.astimezone(timezone.utc)
-
-                    while SecondTouchSchedule.objects.filter(
-                        sent=False,
-                        scheduled_time__range=(
-                            second_touch_time - timedelta(minutes=1),
-                            second_touch_time + timedelta(minutes=1)
-                        )
-                    ).exclude(user=user).exists():
-                        second_touch_time += timedelta(minutes=settings.message_interval_minutes)
-                        local_second_touch_time = django_timezone.localtime(second_touch_time)
-                        if local_second_touch_time.hour >= 21:
-                            local_second_touch_time = (local_second_touch_time + timedelta(days=1)).replace(hour=11, minute=0, second=0, microsecond=0)
-                            second_touch_time = local_second_touch_time.astimezone(timezone.utc)
-
-                    second_touch = SecondTouchSchedule.objects.create(
-                        user=user,
-                        message=second_touch_message,
-                        scheduled_time=second_touch_time
-                    )
-                    print(f"Scheduled second touch for {user.telegram_id} at {django_timezone.localtime(second_touch_time)} (local time) (ID: {second_touch.id})")
+                        step=step,
+                        message_id=step.message_id,
+                        scheduled_time=bot.stored_time(touch_time)
+                    ))
+
+                scheduled_count += 1
+                logger.debug("Scheduled %s touches for %s via %s, last at %s (local time)", len(steps), user.telegram_id, bot.name, django_timezone.localtime(touch_time))
+
+            TouchSchedule.objects.bulk_create(touches, batch_size=BULK_BATCH_SIZE)
+            PendingUser.objects.filter(id__in=[pending_user.id for pending_user in pending_users]).update(is_processed=True)
+            return scheduled_count
+
+        processed_count = 0
+        scheduled_count = 0
+        while True:
+            with transaction.atomic():
+                pending_users = list(pending_users_queue().select_for_update(skip_locked=True)[:PENDING_USERS_CHUNK_SIZE])
+                if not pending_users:
+                    break
+                scheduled_count += schedule_chunk(pending_users)
+            processed_count += len(pending_users)
+            logger.info("Committed chunk of %s pending users (%s so far)", len(pending_users), processed_count)
+
+        logger.info("Processed %s pending users, scheduled touches for %s", processed_count, scheduled_count)
+
+
+def orphaned_touches():
+    return pending_touches().filter(Q(user__bot__isnull=True) | Q(user__bot__is_active=False))
 
-                    print(f"Pending user {pending_user.telegram_id} processed")
-            else:
-                print("No pending users to process")
+
+def reassign_orphaned_users():
+    """Move users of deactivated or deleted bots, with their unsent touches, onto active bots."""
+    from bots.models import Bot, TouchSchedule, User
+    from bots.utils import assign_bots
+
+    with scheduler_lock:
+        user_ids = set(orphaned_touches().values_list('user_id', flat=True))
+        if not user_ids:
+            return 0
+
+        bots = {bot.id: bot for bot in get_bots()}
+        if not bots:
+            logger.warning("No active bots found, %s users with unsent touches stay unassigned", len(user_ids))
+            return 0
+        old_bots = {bot.id: bot for bot in get_bots(active_only=False)}
+        settings = get_settings()
+
+        with transaction.atomic():
+            # Build the allocators before moving anyone, so the orphans' own rows do not block slots.
+            touch_slots = SlotAllocator.per_bot(TouchSchedule, bots.values(), settings)
+            users = list(User.objects.select_for_update().filter(id__in=user_ids))
+            old_bot_ids = {user.id: user.bot_id for user in users}
+            for user in users:
+                user.bot = None
+            assign_bots(users, Bot.objects.filter(id__in=bots))
+            User.objects.bulk_update(users, ['bot'], batch_size=BULK_BATCH_SIZE)
+
+            now = django_timezone.now()
+            touches = list(
+                TouchSchedule.objects.filter(user_id__in=user_ids, sent=False, cancelled=False).order_by('user_id', 'scheduled_time')
+            )
+            new_bot_ids = {user.id: user.bot_id for user in users}
+            previous = {}
+            for touch in touches:
+                old_bot = old_bots.get(old_bot_ids[touch.user_id])
+                old_time = old_bot.effective_time(touch.scheduled_time) if old_bot else touch.scheduled_time
+                earliest = max(old_time, now)
+                if touch.user_id in previous:
+                    # Keep the gaps between a user's touches.
+                    previous_old, previous_new = previous[touch.user_id]
+                    earliest = max(earliest, previous_new + (old_time - previous_old))
+                bot = bots[new_bot_ids[touch.user_id]]
+                new_time = touch_slots[bot.id].allocate(earliest)
+                previous[touch.user_id] = (old_time, new_time)
+                touch.scheduled_time = bot.stored_time(new_time)
+                touch.claimed_by = ''
+                touch.lease_expires_at = None
+            TouchSchedule.objects.bulk_update(touches, ['scheduled_time', 'claimed_by', 'lease_expires_at'], batch_size=BULK_BATCH_SIZE)
+
+        logger.info("Reassigned %s users and %s unsent touches from inactive or deleted bots", len(users), len(touches))
+        return len(users)
 
 
 def get_next_schedule_time():
     from django.utils import timezone as django_timezone
-    from bots.models import FirstTouchSchedule, SecondTouchSchedule
 
     now = django_timezone.localtime(django_timezone.now())
-    next_first_touch = FirstTouchSchedule.objects.filter(
-        sent=False,
-        scheduled_time__gt=now
-    ).order_by('scheduled_time').first()
-
-    next_second_touch = SecondTouchSchedule.objects.filter(
-        sent=False,
-        scheduled_time__gt=now
-    ).order_by('scheduled_time').first()
+    bots = get_bots()
+    healthy_bots = [bot for bot in bots if not bot.is_frozen(now)]
 
-    if not next_first_touch and not next_second_touch:
-        return None
+    next_times = [bot.banned_until for bot in bots if bot.is_frozen(now)]
+    # Each bot shifts its touches by its own ban offset, so look up the next one per bot.
+    for bot in healthy_bots:
+        next_time = upcoming_touches(bot, now).values_list('scheduled_time', flat=True).first()
+        if next_time:
+            next_times.append(bot.effective_time(next_time))
 
-    next_time = None
-    if next_first_touch:
-        next_time = next_first_touch.scheduled_time
-    if next_second_touch and (next_time is None or next_second_touch.scheduled_time < next_time):
-        next_time = next_second_touch.scheduled_time
+    # Due touches leased by a dispatcher that died become claimable again when the lease runs out.
+    lease_expiry = leased_touches(healthy_bots, now).values_list('lease_expires_at', flat=True).first()
+    if lease_expiry:
+        next_times.append(lease_expiry)
 
-    return next_time
+    return min(next_times) if next_times else None
 
 
 def run_scheduler():
+    notifier = SchedulerNotifier()
+    leader = LeaderElection(runtime='thread')
+    metrics.start_publishing()
     while True:
-        now = django_timezone.localtime(django_timezone.now())
-        process_schedules()
-        process_pending_users()
+        if not leader.ensure():
+            notifier.close()
+            connection.close()
+            time.sleep(STANDBY_POLL_SECONDS)
+            continue
+
+        with metrics.scheduler_loop_seconds.time(runtime='thread'):
+            notifier.drain()
+            retry_in = process_schedules()
+            process_pending_users()
+            reassign_orphaned_users()
+            update_queue_depth()
+
+        if retry_in is not None:
+            logger.debug("Due schedules left after this batch, retrying in %.2f seconds...", retry_in)
+            if retry_in > 0:
+                notifier.wait(retry_in)
+            continue
 
         next_time = get_next_schedule_time()
         now = django_timezone.localtime(django_timezone.now())
@@ -237,11 +463,15 @@ def run_scheduler():
             if sleep_seconds <= 0:
                 sleep_seconds = 1
             else:
-                print(f"Next schedule at {next_time}, sleeping for {sleep_seconds:.2f} seconds...")
-                time.sleep(sleep_seconds)
+                logger.debug("Next schedule at %s, waiting up to %.2f seconds...", next_time, sleep_seconds)
+                notified = notifier.wait(sleep_seconds)
+                if notified:
+                    logger.debug("Woken up by changes in %s", ', '.join(sorted(set(notified))))
         else:
-            print("No upcoming schedules, sleeping for 3 minutes...")
-            time.sleep(180)
+            logger.debug("No upcoming schedules, waiting up to %s seconds...", IDLE_WAIT_SECONDS)
+            notified = notifier.wait(IDLE_WAIT_SECONDS)
+            if notified:
+                logger.debug("Woken up by changes in %s", ', '.join(sorted(set(notified))))
 
 
 def start_scheduler():
@@ -251,9 +481,9 @@ def start_scheduler():
 
     global scheduler_lock
     if scheduler_lock.locked():
-        print("Scheduler is already running, skipping new instance.")
+        logger.warning("Scheduler is already running, skipping new instance.")
         return
 
-    print("Starting scheduler in a background thread...")
+    logger.info("Starting scheduler in a background thread...")
     scheduler_thread = Thread(target=run_scheduler, daemon=True)
     scheduler_thread.start()
\ No newline at end of file
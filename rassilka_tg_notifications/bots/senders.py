@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import random
+import time
+import zlib
+from collections import Counter
+from threading import Lock
+from django.conf import settings
+from django.utils.module_loading import import_string
+from bots import metrics
+
+DEFAULT_SENDER_BACKEND = 'bots.senders.TelethonBackend'
+
+logger = logging.getLogger(__name__)
+
+
+class SendError(Exception):
+    pass
+
+
+class RecipientNotFound(SendError):
+    pass
+
+
+class FloodWait(SendError):
+    def __init__(self, seconds):
+        super().__init__(f"A wait of {seconds} seconds is required")
+        self.seconds = seconds
+
+
+class SenderBackend:
+    """Delivers one message and returns (peer_id, access_hash) when it had to resolve the recipient, else None."""
+
+    async def send(self, session, username, message_text, cached_peer=None):
+        raise NotImplementedError
+
+    def send_sync(self, session, username, message_text, cached_peer=None):
+        return asyncio.run(self.send(session, username, message_text, cached_peer))
+
+    def bind_loop(self, loop):
+        pass
+
+    async def close(self):
+        pass
+
+
+def with_at(username):
+    return username if username.startswith('@') else '@' + username
+
+
+class TelethonBackend(SenderBackend):
+    def __init__(self, pool=None):
+        self._pool = pool
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            from bots.client_pool import get_client_pool
+            self._pool = get_client_pool()
+        return self._pool
+
+    async def _deliver(self, client, session, username, message_text, cached_peer):
+        from telethon.errors import PeerIdInvalidError, UserIdInvalidError, FloodWaitError
+        from telethon.tl.types import InputPeerUser
+
+        username = with_at(username)
+        try:
+            if cached_peer:
+                try:
+                    logger.debug("Sending message to %s using cached peer...", username)
+                    with metrics.telegram_send_seconds.time(session=session):
+                        await client.send_message(InputPeerUser(*cached_peer), message_text)
+                    return None
+                except (PeerIdInvalidError, UserIdInvalidError):
+                    logger.info("Cached peer for %s is no longer valid, resolving again...", username)
+
+            logger.debug("Fetching entity for %s...", username)
+            try:
+                with metrics.telegram_resolve_seconds.time(session=session):
+                    entity = await client.get_entity(username)
+            except (PeerIdInvalidError, ValueError):
+                logger.warning("Error: The username %s is invalid or inaccessible.", username)
+                raise RecipientNotFound(f"Cannot access user with username {username}")
+
+            logger.debug("Sending message to %s...", username)
+            with metrics.telegram_send_seconds.time(session=session):
+                await client.send_message(entity, message_text)
+            return entity.id, entity.access_hash
+        except FloodWaitError as e:
+            raise FloodWait(e.seconds) from e
+
+    async def send(self, session, username, message_text, cached_peer=None):
+        return await self.pool.call(
+            session, lambda client: self._deliver(client, session, username, message_text, cached_peer)
+        )
+
+    def send_sync(self, session, username, message_text, cached_peer=None):
+        return self.pool.run(
+            session, lambda client: self._deliver(client, session, username, message_text, cached_peer)
+        )
+
+    def bind_loop(self, loop):
+        self.pool.bind_loop(loop)
+
+    async def close(self):
+        await self.pool.disconnect_all()
+
+
+class FakeBackend(SenderBackend):
+    """In-memory transport for load tests: configurable latency, random errors and FloodWait injection."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, not_found_rate=0.0,
+                 flood_wait_rate=0.0, flood_wait_seconds=30, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self.flood_wait_rate = flood_wait_rate
+        self.flood_wait_seconds = flood_wait_seconds
+        self.sent = Counter()
+        self.outcomes = Counter()
+        self._random = random.Random(seed)
+        self._lock = Lock()
+
+    def _delay(self):
+        with self._lock:
+            return max(self.latency + self._random.uniform(-self.jitter, self.jitter), 0)
+
+    def _pick_outcome(self, session):
+        with self._lock:
+            roll = self._random.random()
+            for outcome, rate in (('flood_wait', self.flood_wait_rate), ('error', self.error_rate), ('not_found', self.not_found_rate)):
+                if roll < rate:
+                    break
+                roll -= rate
+            else:
+                outcome = 'sent'
+                self.sent[session] += 1
+            self.outcomes[outcome] += 1
+        return outcome
+
+    def _deliver(self, session, username, cached_peer):
+        outcome = self._pick_outcome(session)
+        if outcome == 'flood_wait':
+            raise FloodWait(self.flood_wait_seconds)
+        if outcome == 'error':
+            raise ConnectionError("Injected transport error")
+        if outcome == 'not_found':
+            raise RecipientNotFound(f"Cannot access user with username {with_at(username)}")
+
+        if cached_peer:
+            return None
+        return zlib.crc32(username.lstrip('@').lower().encode()), 0
+
+    async def send(self, session, username, message_text, cached_peer=None):
+        with metrics.telegram_send_seconds.time(session=session):
+            await asyncio.sleep(self._delay())
+            return self._deliver(session, username, cached_peer)
+
+    def send_sync(self, session, username, message_text, cached_peer=None):
+        with metrics.telegram_send_seconds.time(session=session):
+            time.sleep(self._delay())
+            return self._deliver(session, username, cached_peer)
+
+
+_backend = None
+_backend_lock = Lock()
+
+
+def get_sender_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            backend_class = import_string(getattr(settings, 'BOTS_SENDER_BACKEND', DEFAULT_SENDER_BACKEND))
+            _backend = backend_class(**getattr(settings, 'BOTS_SENDER_OPTIONS', {}))
+    return _backend
+
+
+def reset_sender_backend():
+    global _backend
+    with _backend_lock:
+        _backend = None
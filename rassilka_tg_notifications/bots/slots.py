@@ -0,0 +1,95 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.utils import timezone
+
+WORKING_HOURS_START = 11
+WORKING_HOURS_END = 21
+SLOT_CONFLICT_MINUTES = 1
+# Slot buckets are counted from here, so whole local hours start a bucket for any interval that divides an hour.
+GRID_EPOCH = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def clamp_to_working_hours(scheduled_time):
+    local_time = timezone.localtime(scheduled_time)
+    if local_time.hour < WORKING_HOURS_START:
+        local_time = local_time.replace(hour=WORKING_HOURS_START, minute=0, second=0, microsecond=0)
+    elif local_time.hour >= WORKING_HOURS_END:
+        local_time = (local_time + timedelta(days=1)).replace(hour=WORKING_HOURS_START, minute=0, second=0, microsecond=0)
+    else:
+        return scheduled_time
+    return local_time.astimezone(dt_timezone.utc)
+
+
+class SlotAllocator:
+    """Hands out send times on a per-bot grid of interval-wide buckets, one touch per bucket.
+
+    Taken buckets and buckets outside working hours or inside a ban point at the next bucket worth trying.
+    Lookups compress those chains, so allocating inside a dense run does not walk it slot by slot.
+    """
+
+    def __init__(self, occupied, interval_minutes, ban_windows=()):
+        self.interval = timedelta(minutes=max(interval_minutes, SLOT_CONFLICT_MINUTES))
+        self.ban_windows = sorted(window for window in ban_windows if window[1])
+        self._next = {}
+        for scheduled_time in occupied:
+            # Rows that are not on the grid block both buckets they fall between.
+            for bucket in {self._floor(scheduled_time), self._ceil(scheduled_time)}:
+                self._next[bucket] = bucket + 1
+
+    @classmethod
+    def per_bot(cls, model, bots, settings):
+        occupied = defaultdict(list)
+        for bot_id, scheduled_time in model.objects.filter(
+            sent=False, cancelled=False, user__bot__in=bots
+        ).values_list('user__bot_id', 'scheduled_time'):
+            occupied[bot_id].append(scheduled_time)
+        # Slots are handed out in effective time, i.e. with the bot's ban offset applied.
+        return {
+            bot.id: cls(
+                [bot.effective_time(scheduled_time) for scheduled_time in occupied[bot.id]],
+                bot.get_message_interval(settings),
+                bot.ban_windows()
+            )
+            for bot in bots
+        }
+
+    def _floor(self, scheduled_time):
+        return (scheduled_time - GRID_EPOCH) // self.interval
+
+    def _ceil(self, scheduled_time):
+        bucket, remainder = divmod(scheduled_time - GRID_EPOCH, self.interval)
+        return bucket + 1 if remainder else bucket
+
+    def bucket_time(self, bucket):
+        return GRID_EPOCH + bucket * self.interval
+
+    def _skip_ban_windows(self, candidate):
+        for start, end in self.ban_windows:
+            if (start is None or start <= candidate) and candidate < end:
+                candidate = end
+        return candidate
+
+    def _usable_from(self, bucket):
+        bucket_time = self.bucket_time(bucket)
+        usable_time = clamp_to_working_hours(self._skip_ban_windows(bucket_time))
+        return bucket if usable_time == bucket_time else self._ceil(usable_time)
+
+    def _find(self, bucket):
+        path = []
+        while True:
+            next_bucket = self._next.get(bucket)
+            if next_bucket is None:
+                next_bucket = self._usable_from(bucket)
+                if next_bucket == bucket:
+                    break
+                self._next[bucket] = next_bucket
+            path.append(bucket)
+            bucket = next_bucket
+        for visited in path:
+            self._next[visited] = bucket
+        return bucket
+
+    def allocate(self, earliest):
+        bucket = self._find(self._ceil(earliest))
+        self._next[bucket] = bucket + 1
+        return self.bucket_time(bucket)
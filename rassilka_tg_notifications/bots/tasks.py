@@ -1,107 +1,201 @@
-import os
-from telethon import TelegramClient
-from .models import Bot
+from .config import get_default_bot
+from .leader import LeaderElection
+from .peer_cache import peer_cache
+from .ratelimit import rate_limiter
+from .senders import FloodWait, RecipientNotFound, get_sender_backend
+from . import metrics
+from django.conf import settings
 from django.utils import timezone
-from concurrent.futures import ThreadPoolExecutor
-from telethon.errors import PeerIdInvalidError, FloodWaitError
-from dotenv import load_dotenv
-import asyncio
+import logging
+import time
+from asgiref.sync import sync_to_async
+from celery import shared_task
 
-load_dotenv()
-API_ID = int(os.getenv('API_ID'))
-API_HASH = os.getenv('API_HASH')
-PHONE_NUMBER = os.getenv('PHONE_NUMBER')
+SEND_QUEUE_PREFIX = 'send.'
+DEFAULT_DISPATCH_INTERVAL_SECONDS = 15
 
-SESSION_FILE = 'sender'
+logger = logging.getLogger(__name__)
 
+planner_lock = LeaderElection(runtime='celery')
 
-def send_message(schedule):
-    print(f"Starting send_message for user {schedule.user.telegram_id} at {timezone.now()}")
+
+def db_call(func):
+    return sync_to_async(func, thread_sensitive=False)
+
+
+def prepare_send(schedule, bot=None):
+    if bot is None:
+        bot = schedule.user.bot or get_default_bot()
+    if not bot:
+        logger.error("Bot not found. Please create a Bot instance in the admin panel.")
+        raise ValueError("Bot not found. Please create a Bot instance in the admin panel.")
+
+    if bot.is_banned and not bot.is_frozen() and bot.lift_expired_ban():
+        logger.info("Ban period ended for bot %s. Reset is_banned to False.", bot.name)
+
+    if bot.is_frozen():
+        logger.warning("Bot %s is banned until %s. Skipping message.", bot.name, bot.banned_until)
+        return bot, False
+
+    user = schedule.user
+    logger.debug("User %s: responded=%s, step=%s, message_text='%s'", user.telegram_id, user.responded, schedule.step.step, schedule.message.text)
+
+    if schedule.step.skip_if_responded and user.responded:
+        logger.info("User %s has responded. Skipping touch #%s.", user.telegram_id, schedule.step.step)
+        return bot, True
+
+    logger.debug("Sending message to %s: %s", user.name, schedule.message.text)
+    return bot, None
+
+
+def record_delivery(schedule, bot, resolved_peer):
+    session = bot.session_name
+    user = schedule.user
+    if resolved_peer:
+        peer_cache.store(user.id, session, *resolved_peer)
+    rate_limiter.on_success(session)
+    metrics.messages_sent_total.inc(session=session, step=schedule.step.step)
+    lag = timezone.now() - bot.effective_time(schedule.scheduled_time)
+    metrics.dispatch_lag_seconds.observe(max(lag.total_seconds(), 0), step=schedule.step.step)
+
+    user.last_message_time = timezone.now()
+    # The row was loaded at claim time; a full save would undo replies and bot reassignments made since.
+    user.save(update_fields=['last_message_time'])
+    logger.info("Message sent to %s", user.name)
+
+
+def record_flood_wait(bot, error):
+    logger.warning("Flood wait error: %s seconds. Bot is likely banned.", error.seconds)
+    if bot is None:
+        bot = get_default_bot()
+    if bot:
+        metrics.flood_waits_total.inc(session=bot.session_name)
+        metrics.flood_wait_seconds_total.inc(error.seconds, session=bot.session_name)
+        metrics.bot_banned.set(1, session=bot.session_name)
+        rate_per_minute = rate_limiter.on_flood_wait(bot.session_name, error.seconds)
+        logger.warning("Send rate for bot %s reduced to %.2f messages per minute.", bot.name, rate_per_minute)
+        bot.ban_for(timezone.timedelta(seconds=error.seconds))
+        logger.warning("Bot %s marked as banned until %s.", bot.name, bot.banned_until)
+
+
+def send_message(schedule, bot=None):
+    logger.debug("Starting send_message for user %s", schedule.user.telegram_id)
 
     try:
-        bot = Bot.objects.first()
-        if not bot:
-            print("Bot not found. Please create a Bot instance in the admin panel.")
-            raise ValueError("Bot not found. Please create a Bot instance in the admin panel.")
+        bot, result = prepare_send(schedule, bot)
+        if result is not None:
+            return result
 
-        if bot.is_banned and bot.banned_until and bot.banned_until <= timezone.now():
-            print(f"Ban period ended for bot at {timezone.now()}. Resetting is_banned to False.")
-            bot.is_banned = False
-            bot.banned_until = None
-            bot.save()
+        user = schedule.user
+        session = bot.session_name
+        cached_peer = peer_cache.get(user.id, session)
 
-        if bot.is_banned and bot.banned_until and bot.banned_until > timezone.now():
-            print(f"Bot is banned until {bot.banned_until}. Skipping message.")
-            return False
+        try:
+            resolved_peer = get_sender_backend().send_sync(session, user.name, schedule.message.text, cached_peer)
+        except RecipientNotFound:
+            if cached_peer:
+                peer_cache.invalidate(user.id, session)
+            raise
+
+        record_delivery(schedule, bot, resolved_peer)
+        return True
+
+    except FloodWait as e:
+        record_flood_wait(bot, e)
+        return False
+    except (RecipientNotFound, ValueError) as e:
+        logger.warning("Error: %s", e)
+        return True
+    except Exception as e:
+        metrics.send_errors_total.inc(session=getattr(bot, 'session_name', ''))
+        logger.exception("Error sending message: %s", e)
+        return False
+
+
+async def send_message_async(schedule, bot=None):
+    logger.debug("Starting send_message_async for user %s", schedule.user.telegram_id)
+
+    try:
+        bot, result = await db_call(prepare_send)(schedule, bot)
+        if result is not None:
+            return result
 
         user = schedule.user
-        print(f"User {user.telegram_id}: responded={user.responded}, is_second_touch={schedule.message.is_second_touch}, message_text='{schedule.message.text}'")
-
-        if schedule.message.is_second_touch and user.responded:
-            print(f"User {user.telegram_id} has responded. Skipping second touch message.")
-            return True
-
-        username = user.name
-        message_text = schedule.message.text
-        print(f"Sending message to {username}: {message_text}")
-
-        def run_telegram_task():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-            try:
-                client = TelegramClient(SESSION_FILE, API_ID, API_HASH, loop=loop)
-
-                async def send_telegram_message():
-                    print(f"Connecting to Telegram for {username}...")
-                    await client.connect()
-                    if not await client.is_user_authorized():
-                        await client.start(phone=PHONE_NUMBER)
-                        print("Authorized successfully.")
-
-                    if not username.startswith('@'):
-                        username_with_at = '@' + username
-                    else:
-                        username_with_at = username
-
-                    print(f"Fetching entity for {username_with_at}...")
-                    try:
-                        entity = await client.get_entity(username_with_at)
-                        print(f"Entity found: {entity}")
-                    except PeerIdInvalidError:
-                        print(f"Error: The username {username_with_at} is invalid or inaccessible.")
-                        raise ValueError(f"Cannot access user with username {username_with_at}")
-
-                    print(f"Sending message to {username_with_at}...")
-                    await client.send_message(entity, message_text)
-                    print("Message sent, disconnecting...")
-                    await client.disconnect()
-
-                loop.run_until_complete(send_telegram_message())
-            finally:
-                loop.close()
-
-        with ThreadPoolExecutor() as executor:
-            future = executor.submit(run_telegram_task)
-            future.result()
-
-        user.last_message_time = timezone.now()
-        user.save()
-        print(f"Message sent to {username} at {timezone.now()}")
+        session = bot.session_name
+        cached_peer = await db_call(peer_cache.get)(user.id, session)
+
+        try:
+            resolved_peer = await get_sender_backend().send(session, user.name, schedule.message.text, cached_peer)
+        except RecipientNotFound:
+            if cached_peer:
+                await db_call(peer_cache.invalidate)(user.id, session)
+            raise
+
+        await db_call(record_delivery)(schedule, bot, resolved_peer)
         return True
 
-    except FloodWaitError as e:
-        print(f"Flood wait error: {e.seconds} seconds. Bot is likely banned.")
-        bot = Bot.objects.first()
-        if bot:
-            bot.is_banned = True
-            bot.banned_until = timezone.now() + timezone.timedelta(seconds=e.seconds)
-            bot.save()
-            print(f"Bot marked as banned until {bot.banned_until}.")
+    except FloodWait as e:
+        await db_call(record_flood_wait)(bot, e)
         return False
-    except ValueError as e:
-        print(f"Error: {str(e)} at {timezone.now()}")
+    except (RecipientNotFound, ValueError) as e:
+        logger.warning("Error: %s", e)
         return True
     except Exception as e:
-        print(f"Error sending message: {str(e)} at {timezone.now()}")
+        metrics.send_errors_total.inc(session=getattr(bot, 'session_name', ''))
+        logger.exception("Error sending message: %s", e)
         return False
+
+
+def send_queue(bot):
+    return f"{SEND_QUEUE_PREFIX}{bot.session_name}"
+
+
+def dispatch_interval():
+    return getattr(settings, 'BOTS_DISPATCH_INTERVAL_SECONDS', DEFAULT_DISPATCH_INTERVAL_SECONDS)
+
+
+@shared_task(ignore_result=True)
+def plan_tick():
+    from .scheduler import process_pending_users, reassign_orphaned_users, update_queue_depth
+
+    with planner_lock.exclusive() as acquired:
+        if not acquired:
+            logger.info("Another process is planning, skipping this tick")
+            return
+        process_pending_users()
+        reassign_orphaned_users()
+        update_queue_depth()
+
+
+@shared_task(ignore_result=True)
+def dispatch_tick():
+    from .scheduler import prepare_dispatch
+
+    _, _, bots = prepare_dispatch()
+    for bot in bots:
+        # A run that is still queued when the next tick fires would only duplicate that tick's run.
+        dispatch_bot.apply_async(args=[bot.id], queue=send_queue(bot), expires=dispatch_interval())
+    return len(bots)
+
+
+@shared_task(ignore_result=True)
+def dispatch_bot(bot_id):
+    from .scheduler import dispatch_for_bot, prepare_dispatch
+
+    # Keep sending until the next tick instead of re-enqueueing, so each bot has at most one run in flight.
+    deadline = time.monotonic() + dispatch_interval()
+    processed = 0
+    while True:
+        now, batch_size, bots = prepare_dispatch()
+        bot = next((bot for bot in bots if bot.id == bot_id), None)
+        if bot is None:
+            logger.debug("Bot %s is not available for dispatch, skipping", bot_id)
+            return processed
+
+        count, retry_in = dispatch_for_bot(bot, now, batch_size)
+        processed += count
+        # Eager mode runs inside dispatch_tick, so leave the rest of the backlog to the next tick there.
+        if retry_in is None or dispatch_bot.app.conf.task_always_eager or time.monotonic() + retry_in >= deadline:
+            return processed
+        logger.debug("Due schedules left for bot %s, continuing in %.2f seconds", bot.name, retry_in)
+        time.sleep(retry_in)
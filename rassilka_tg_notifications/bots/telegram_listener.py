@@ -4,53 +4,112 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rassilka_tg_notifications.settings')
 django.setup()
 
+import asyncio
+import logging
 from telethon import TelegramClient, events
+from django.db import transaction
 from django.utils import timezone
+from bots.client_pool import telegram_credentials
 from bots.models import User
-from dotenv import load_dotenv
+from bots.scheduler import cancel_followups
 from asgiref.sync import sync_to_async
 
-load_dotenv()
-
-API_ID = int(os.getenv('API_ID'))
-API_HASH = os.getenv('API_HASH')
 SESSION_FILE = 'listener'
 
-get_user = sync_to_async(User.objects.get)
-save_user = sync_to_async(lambda user: user.save())
+logger = logging.getLogger('bots.telegram_listener')
+
+FLUSH_INTERVAL_SECONDS = 5
+KNOWN_USERS_REFRESH_SECONDS = 60
+
+
+class ResponseTracker:
+    def __init__(self):
+        self.known_telegram_ids = set()
+        self.last_user_id = 0
+        self.pending_responses = set()
+
+    def refresh_known_users(self):
+        new_users = list(User.objects.filter(id__gt=self.last_user_id).values_list('id', 'telegram_id'))
+        for user_id, telegram_id in new_users:
+            self.known_telegram_ids.add(telegram_id)
+            self.last_user_id = max(self.last_user_id, user_id)
+        return len(new_users)
+
+    def flush_responses(self, telegram_ids):
+        with transaction.atomic():
+            updated = User.objects.filter(
+                telegram_id__in=telegram_ids,
+                responded=False
+            ).update(responded=True, last_message_time=timezone.now())
+            cancelled = cancel_followups(telegram_ids)
+        return updated, cancelled
+
+    def record(self, telegram_id):
+        if telegram_id not in self.known_telegram_ids:
+            return False
+        self.pending_responses.add(telegram_id)
+        return True
+
+    def take_pending(self):
+        telegram_ids, self.pending_responses = self.pending_responses, set()
+        return list(telegram_ids)
+
+
+tracker = ResponseTracker()
 
 
 async def handle_new_message(event):
-    sender = await event.get_sender()
-    telegram_id = str(sender.id)
-    message_text = event.message.text
+    telegram_id = str(event.sender_id)
+    if tracker.record(telegram_id):
+        logger.debug("Received message from known user %s, queued responded=True", telegram_id)
 
-    print(f"Received message from {telegram_id}: {message_text}")
 
+async def flush_pending_responses():
+    telegram_ids = tracker.take_pending()
+    if not telegram_ids:
+        return
     try:
-
-        user = await get_user(telegram_id=telegram_id)
-        print(f"Found user: {user.telegram_id}, current responded: {user.responded}")
-        if not user.responded:
-            user.responded = True
-            user.last_message_time = timezone.now()
-            await save_user(user)
-            print(f"User {telegram_id} responded. Updated responded=True.")
-        else:
-            print(f"User {telegram_id} already marked as responded.")
-    except User.DoesNotExist:
-        print(f"User with telegram_id {telegram_id} not found.")
+        updated, cancelled = await sync_to_async(tracker.flush_responses)(telegram_ids)
+        logger.info("Marked %s of %s users as responded, cancelled %s follow-up touches", updated, len(telegram_ids), cancelled)
     except Exception as e:
-        print(f"Error updating user {telegram_id}: {str(e)}")
+        tracker.pending_responses.update(telegram_ids)
+        logger.exception("Error updating responded users: %s", e)
+
+
+async def flush_loop():
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+        await flush_pending_responses()
+
+
+async def refresh_loop():
+    while True:
+        await asyncio.sleep(KNOWN_USERS_REFRESH_SECONDS)
+        try:
+            added = await sync_to_async(tracker.refresh_known_users)()
+            if added:
+                logger.info("Loaded %s new users, tracking %s in total", added, len(tracker.known_telegram_ids))
+        except Exception as e:
+            logger.exception("Error refreshing known users: %s", e)
 
 
 async def main():
-    client = TelegramClient(SESSION_FILE, API_ID, API_HASH)
+    await sync_to_async(tracker.refresh_known_users)()
+    logger.info("Tracking replies from %s users", len(tracker.known_telegram_ids))
+
+    api_id, api_hash, _ = telegram_credentials()
+    client = TelegramClient(SESSION_FILE, api_id, api_hash)
     client.on(events.NewMessage(incoming=True))(handle_new_message)
     await client.start()
-    print("Listening for new messages...")
-    await client.run_until_disconnected()
+    logger.info("Listening for new messages...")
+
+    background_tasks = [asyncio.create_task(flush_loop()), asyncio.create_task(refresh_loop())]
+    try:
+        await client.run_until_disconnected()
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        await flush_pending_responses()
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from bots.config import BOTS_KEY, SETTINGS_KEY, config_cache, get_bots
+from bots.models import Bot, Message, Settings, TouchSchedule, TouchStep, User
+from bots.scheduler import claim_due_schedules, get_dispatch_bots, get_next_schedule_time
+from bots.senders import FloodWait
+from bots.tasks import record_flood_wait
+
+START = timezone.make_aware(datetime(2026, 3, 2, 12, 0))
+
+
+def at(minutes):
+    return mock.patch('django.utils.timezone.now', return_value=START + timedelta(minutes=minutes))
+
+
+class BanOffsetTests(TestCase):
+    def setUp(self):
+        config_cache.invalidate(SETTINGS_KEY, BOTS_KEY)
+        # Migrations seed a default touch sequence.
+        TouchStep.objects.all().delete()
+        Settings.objects.all().delete()
+        Settings.objects.create(ban_freeze_minutes=60)
+        self.bot = Bot.objects.create(name="Main", session_name='main')
+        message = Message.objects.create(text="Hello")
+        step = TouchStep.objects.create(step=1, message=message)
+        for index in range(3):
+            user = User.objects.create(telegram_id=str(index), name=f"user_{index}", bot=self.bot)
+            TouchSchedule.objects.create(user=user, step=step, message=message, scheduled_time=START + timedelta(minutes=6 * index))
+
+    def ban(self, minutes):
+        with at(minutes):
+            self.bot.is_banned = True
+            self.bot.save()
+
+    def due(self, minutes):
+        with at(minutes):
+            return [schedule.user.telegram_id for schedule in claim_due_schedules(self.bot, START + timedelta(minutes=minutes), 10, 'test')]
+
+    def test_ban_shifts_unsent_touches_and_keeps_spacing(self):
+        self.ban(0)
+        self.assertEqual(self.bot.schedule_offset, timedelta(minutes=60))
+        self.assertEqual(self.due(30), [])
+        self.assertEqual(self.due(60), ['0'])
+        self.assertEqual(self.due(66), ['1'])
+
+    def test_natural_expiry_keeps_offset(self):
+        self.ban(0)
+        with at(61):
+            self.bot.is_banned = False
+            self.bot.save()
+            self.assertEqual(self.bot.schedule_offset, timedelta(minutes=60))
+            self.assertEqual(get_next_schedule_time(), START + timedelta(minutes=66))
+
+    def test_early_unban_returns_unserved_time(self):
+        self.ban(0)
+        with at(20):
+            self.bot.is_banned = False
+            self.bot.save()
+        self.assertEqual(self.bot.schedule_offset, timedelta(minutes=20))
+        self.assertEqual(self.due(20), ['0'])
+
+    def test_ban_with_explicit_end_shifts_touches(self):
+        with at(0):
+            self.bot.is_banned = True
+            self.bot.banned_until = START + timedelta(minutes=30)
+            self.bot.save()
+        self.assertEqual(self.bot.schedule_offset, timedelta(minutes=30))
+        self.assertEqual(self.due(29), [])
+        self.assertEqual(self.due(30), ['0'])
+
+    def test_early_unban_keeps_offset_of_earlier_bans(self):
+        self.ban(0)
+        with at(61):
+            self.bot.is_banned = False
+            self.bot.save()
+        with at(70):
+            self.bot.is_banned = True
+            self.bot.banned_until = START + timedelta(minutes=100)
+            self.bot.save()
+        with at(80):
+            self.bot.is_banned = False
+            self.bot.save()
+        # Only the unserved part of the second ban is taken back.
+        self.assertEqual(self.bot.schedule_offset, timedelta(minutes=70))
+
+    def test_ban_updates_keep_admin_edits_on_cached_copies(self):
+        self.ban(0)
+        cached, = get_bots()
+        Bot.objects.filter(pk=self.bot.pk).update(name="Renamed", message_interval_minutes=9)
+
+        with at(61):
+            self.assertEqual([bot.pk for bot in get_dispatch_bots(START + timedelta(minutes=61))], [self.bot.pk])
+        with at(70):
+            record_flood_wait(cached, FloodWait(60))
+
+        self.bot.refresh_from_db()
+        self.assertEqual((self.bot.name, self.bot.message_interval_minutes), ("Renamed", 9))
+        self.assertEqual(self.bot.banned_until, START + timedelta(minutes=71))
+        self.assertEqual(self.bot.schedule_offset, timedelta(minutes=61))
@@ -0,0 +1,33 @@
+import io
+import tempfile
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from bots.models import PendingUser, User
+
+
+class ImportLeadsTests(TestCase):
+    def run_import(self, content, suffix='.csv'):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            call_command('import_leads', f.name, stdout=io.StringIO())
+
+    def test_id_and_username_go_to_the_fields_dispatch_uses(self):
+        self.run_import("telegram_id,username,first_name\n8180735190,@Ivan_Petrov,Ivan\n123,https://t.me/Some_User?x=1,Some\n")
+        self.assertEqual(
+            sorted(PendingUser.objects.values_list('telegram_id', 'name')),
+            [('123', 'some_user'), ('8180735190', 'ivan_petrov')]
+        )
+
+    def test_rows_without_numeric_id_or_username_are_skipped(self):
+        self.run_import("telegram_id,username,first_name\nabc,valid_user,x\n456,,NoUser\n789,Ivan,Ivan\n")
+        self.assertFalse(PendingUser.objects.exists())
+
+    def test_display_name_column_alone_is_rejected(self):
+        with self.assertRaises(CommandError):
+            self.run_import("username,first_name\n@Ivan_Petrov,Ivan\n")
+
+    def test_existing_users_and_duplicates_are_not_queued(self):
+        User.objects.create(telegram_id='1', name='known_user')
+        self.run_import('{"telegram_id": 1, "username": "known_user"}\n{"id": 2, "username": "new_user"}\n{"id": 2, "username": "new_user"}\n', '.jsonl')
+        self.assertEqual(list(PendingUser.objects.values_list('telegram_id', 'name')), [('2', 'new_user')])
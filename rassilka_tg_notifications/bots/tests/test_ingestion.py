@@ -0,0 +1,94 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from bots.config import BOTS_KEY, SETTINGS_KEY, config_cache
+from bots.models import Bot, Message, PendingUser, Settings, TouchSchedule, TouchStep, User
+from bots.scheduler import process_pending_users
+
+START = timezone.make_aware(datetime(2026, 3, 2, 12, 0))
+MESSAGE_INTERVAL_MINUTES = 6
+FOLLOW_UP_DELAY_MINUTES = 60
+
+
+class PendingUsersTests(TestCase):
+    def setUp(self):
+        config_cache.invalidate(SETTINGS_KEY, BOTS_KEY)
+        # Migrations seed a default touch sequence.
+        TouchStep.objects.all().delete()
+        Settings.objects.all().delete()
+        Settings.objects.create(message_interval_minutes=MESSAGE_INTERVAL_MINUTES)
+        self.bots = [Bot.objects.create(name=f"Bot {index}", session_name=f'bot_{index}') for index in range(2)]
+        message = Message.objects.create(text="Hello")
+        self.steps = [
+            TouchStep.objects.create(step=1, message=message),
+            TouchStep.objects.create(step=2, message=message, delay_minutes=FOLLOW_UP_DELAY_MINUTES),
+        ]
+
+    def add_leads(self, count):
+        PendingUser.objects.bulk_create(PendingUser(telegram_id=str(index), name=f"lead_{index}") for index in range(count))
+
+    def process(self):
+        with mock.patch('django.utils.timezone.now', return_value=START):
+            process_pending_users()
+
+    def touches_by_user(self):
+        touches = defaultdict(list)
+        for touch in TouchSchedule.objects.select_related('user__bot', 'step').order_by('step__step'):
+            touches[touch.user.telegram_id].append(touch)
+        return touches
+
+    def test_users_with_unsent_touches_are_skipped_but_processed(self):
+        user = User.objects.create(telegram_id='0', name="lead_0", bot=self.bots[0])
+        existing = TouchSchedule.objects.create(user=user, step=self.steps[1], message=self.steps[1].message, scheduled_time=START)
+        self.add_leads(2)
+
+        self.process()
+
+        self.assertEqual(list(TouchSchedule.objects.filter(user=user)), [existing])
+        self.assertEqual(len(self.touches_by_user()['1']), len(self.steps))
+        self.assertFalse(PendingUser.objects.filter(is_processed=False).exists())
+
+    def test_every_step_is_scheduled_after_its_delay(self):
+        self.add_leads(6)
+
+        self.process()
+
+        for touches in self.touches_by_user().values():
+            self.assertEqual([touch.step for touch in touches], self.steps)
+            first, follow_up = (touch.user.bot.effective_time(touch.scheduled_time) for touch in touches)
+            self.assertGreater(first, START)
+            self.assertGreaterEqual(follow_up - first, timedelta(minutes=FOLLOW_UP_DELAY_MINUTES))
+
+    def test_slots_are_distinct_per_bot(self):
+        self.add_leads(10)
+
+        self.process()
+
+        times = defaultdict(list)
+        for touch in TouchSchedule.objects.select_related('user__bot'):
+            times[touch.user.bot_id].append(touch.user.bot.effective_time(touch.scheduled_time))
+        for bot_times in times.values():
+            bot_times.sort()
+            gaps = [later - earlier for earlier, later in zip(bot_times, bot_times[1:])]
+            self.assertGreaterEqual(min(gaps), timedelta(minutes=MESSAGE_INTERVAL_MINUTES))
+
+    def test_leads_are_spread_across_bots(self):
+        self.add_leads(10)
+
+        self.process()
+
+        self.assertEqual(Counter(User.objects.values_list('bot_id', flat=True)), {bot.id: 5 for bot in self.bots})
+
+    def test_leads_split_across_chunks_are_all_handled(self):
+        self.add_leads(10)
+
+        with mock.patch('bots.scheduler.PENDING_USERS_CHUNK_SIZE', 3):
+            self.process()
+
+        self.assertFalse(PendingUser.objects.filter(is_processed=False).exists())
+        self.assertEqual(User.objects.count(), 10)
+        touches = self.touches_by_user()
+        self.assertEqual(sorted(touches, key=int), [str(index) for index in range(10)])
+        self.assertTrue(all(len(user_touches) == len(self.steps) for user_touches in touches.values()))
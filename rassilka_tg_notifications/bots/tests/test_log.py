@@ -0,0 +1,41 @@
+import json
+import logging
+import os
+import tempfile
+from unittest import skipUnless
+from django.test import SimpleTestCase
+from bots.log import BackgroundHandler
+
+
+class BackgroundHandlerTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'bots.log')
+        self.handler = BackgroundHandler(self.filename, console=False)
+        self.logger = logging.Logger('bots.test_log')
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.handler.close()
+        self.directory.cleanup()
+
+    def messages(self):
+        with open(self.filename, encoding='utf-8') as f:
+            return [json.loads(line)['message'] for line in f]
+
+    def test_records_are_written_as_json(self):
+        self.logger.warning("Bot %s is banned", 'main')
+        self.handler.close()
+        self.assertEqual(self.messages(), ["Bot main is banned"])
+
+    @skipUnless(hasattr(os, 'fork'), "Requires os.fork")
+    def test_forked_child_keeps_logging(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.logger.warning("From child")
+                self.handler.close()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(self.messages(), ["From child"])
@@ -0,0 +1,31 @@
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from bots import metrics
+
+
+@override_settings(BOTS_METRICS_REDIS_URL='')
+class MetricsRenderTests(SimpleTestCase):
+    def test_local_samples_carry_instance_label(self):
+        metrics.send_errors_total.inc(session='metrics-test')
+        self.assertIn(
+            f'bots_send_errors_total{{session="metrics-test",instance="{metrics.instance_id()}"}}', metrics.render()
+        )
+
+    def test_snapshots_of_all_processes_share_one_header(self):
+        snapshots = [
+            {'bots_send_errors_total': [f'bots_send_errors_total{{session="a",instance="{instance}"}} 1.0']}
+            for instance in ('web:1', 'worker:2')
+        ]
+        lines = metrics.render_snapshots(snapshots).splitlines()
+        self.assertEqual(lines.count('# TYPE bots_send_errors_total counter'), 1)
+        self.assertIn('bots_send_errors_total{session="a",instance="web:1"} 1.0', lines)
+        self.assertIn('bots_send_errors_total{session="a",instance="worker:2"} 1.0', lines)
+
+    def test_redis_outage_is_logged_once(self):
+        store = metrics.SnapshotStore()
+        with mock.patch.object(metrics, 'logger') as logger:
+            for _ in range(3):
+                store.failed("Error publishing metrics snapshot: %s", ConnectionError("refused"))
+            store.recovered()
+        self.assertEqual(logger.warning.call_count, 1)
+        self.assertEqual(logger.info.call_count, 1)
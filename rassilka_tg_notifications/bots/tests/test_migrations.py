@@ -0,0 +1,39 @@
+from datetime import timedelta
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+
+class ScheduleOffsetMigrationTests(TransactionTestCase):
+    migrate_from = [('bots', '0011_touchschedule_lease')]
+    migrate_to = [('bots', '0012_bot_schedule_offset')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_shifted_touches_are_restored_before_the_offset_is_applied(self):
+        apps = self.migrate(self.migrate_from)
+        now = timezone.now()
+        original = now + timedelta(minutes=10)
+        bot = apps.get_model('bots', 'Bot').objects.create(
+            name="Main", session_name='main', is_banned=True, banned_until=now + timedelta(hours=1)
+        )
+        user = apps.get_model('bots', 'User').objects.create(telegram_id='1', bot=bot)
+        step = apps.get_model('bots', 'TouchStep').objects.order_by('step').first()
+        touch = apps.get_model('bots', 'TouchSchedule').objects.create(
+            user=user, step=step, message=step.message, scheduled_time=original + timedelta(hours=1),
+            original_scheduled_time=original,
+        )
+
+        apps = self.migrate(self.migrate_to)
+        bot = apps.get_model('bots', 'Bot').objects.get(pk=bot.pk)
+        touch = apps.get_model('bots', 'TouchSchedule').objects.get(pk=touch.pk)
+        self.assertEqual(touch.scheduled_time, original)
+        self.assertAlmostEqual(bot.schedule_offset.total_seconds(), 3600, delta=60)
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from bots.config import BOTS_KEY, SETTINGS_KEY, config_cache
+from bots.models import Bot, Message, Settings, TouchSchedule, TouchStep, User
+from bots.scheduler import orphaned_touches, reassign_orphaned_users
+
+START = timezone.make_aware(datetime(2026, 3, 2, 12, 0))
+
+
+class OrphanedUserTests(TestCase):
+    def setUp(self):
+        config_cache.invalidate(SETTINGS_KEY, BOTS_KEY)
+        TouchStep.objects.all().delete()
+        Settings.objects.all().delete()
+        Settings.objects.create(message_interval_minutes=6)
+        self.active = Bot.objects.create(name="A", session_name='a')
+        self.retired = Bot.objects.create(name="B", session_name='b')
+        message = Message.objects.create(text="Hello")
+        first = TouchStep.objects.create(step=1, message=message)
+        second = TouchStep.objects.create(step=2, message=message, delay_minutes=60)
+        TouchSchedule.objects.create(
+            user=User.objects.create(telegram_id='1', name='kept', bot=self.active),
+            step=first, message=message, scheduled_time=START + timedelta(minutes=30)
+        )
+        for index in range(4):
+            user = User.objects.create(telegram_id=str(10 + index), name=f'moved_{index}', bot=self.retired)
+            scheduled_time = START + timedelta(minutes=30)
+            TouchSchedule.objects.create(user=user, step=first, message=message, scheduled_time=scheduled_time)
+            TouchSchedule.objects.create(user=user, step=second, message=message, scheduled_time=scheduled_time + timedelta(minutes=60))
+
+    def reassign(self):
+        with mock.patch('django.utils.timezone.now', return_value=START):
+            return reassign_orphaned_users()
+
+    def test_deactivated_bot_users_move_to_active_bots(self):
+        self.retired.is_active = False
+        self.retired.save()
+        self.assertEqual(self.reassign(), 4)
+        self.assertFalse(orphaned_touches().exists())
+        times = list(TouchSchedule.objects.filter(user__bot=self.active).values_list('scheduled_time', flat=True))
+        self.assertEqual(len(times), 9)
+        self.assertEqual(len(set(times)), 9)
+        for user in User.objects.filter(name__startswith='moved_'):
+            first, second = user.touchschedule_set.order_by('scheduled_time').values_list('scheduled_time', flat=True)
+            self.assertGreaterEqual(second - first, timedelta(minutes=60))
+
+    def test_deleted_bot_users_move_to_active_bots(self):
+        self.retired.delete()
+        self.assertEqual(self.reassign(), 4)
+        self.assertEqual(User.objects.filter(bot=self.active).count(), 5)
+
+    def test_nothing_to_do_when_all_bots_are_active(self):
+        self.assertEqual(self.reassign(), 0)
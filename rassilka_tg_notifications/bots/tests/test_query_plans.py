@@ -0,0 +1,53 @@
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from bots.models import Bot
+from bots.scheduler import (
+    due_touches, leased_touches, orphaned_touches, pending_touches, pending_users_queue, unsent_touches_for,
+    upcoming_touches,
+)
+
+BATCH_SIZE = 50
+# Both partial indexes cover exactly the pending rows; depending on table statistics the planner either walks
+# pending rows by time or joins them in from the bot's users, and either is fine.
+PENDING_TOUCH_INDEXES = ('bots_touch_pending_time_idx', 'bots_touch_user_pending_idx')
+
+
+@skipUnless(connection.vendor == 'postgresql', "Query plan checks require PostgreSQL")
+class QueryPlanTests(TestCase):
+    """EXPLAIN the scheduler's own querysets and fail if any table in them can only be read by a sequential scan."""
+
+    def setUp(self):
+        self.bot = Bot.objects.create(name="Plan", session_name='plan')
+        self.now = timezone.now()
+        with connection.cursor() as cursor:
+            # Tiny tables are always cheapest to scan, so only ask whether an index can serve the query.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, *index_names):
+        """Index scans over the primary key or unique columns also avoid a Seq Scan, so name the expected index."""
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan", plan, plan)
+        self.assertTrue(any(name in plan for name in index_names), plan)
+
+    def test_pending_users_queue(self):
+        self.assertUsesIndex(pending_users_queue()[:BATCH_SIZE], 'bots_pending_unprocessed_idx')
+
+    def test_due_touches(self):
+        self.assertUsesIndex(due_touches(self.bot, self.now, self.now)[:BATCH_SIZE], *PENDING_TOUCH_INDEXES)
+
+    def test_upcoming_touches(self):
+        self.assertUsesIndex(upcoming_touches(self.bot, self.now)[:1], *PENDING_TOUCH_INDEXES)
+
+    def test_leased_touches(self):
+        self.assertUsesIndex(leased_touches([self.bot], self.now)[:1], *PENDING_TOUCH_INDEXES)
+
+    def test_unsent_touches_for_users(self):
+        self.assertUsesIndex(unsent_touches_for(['1', '2']).filter(step__skip_if_responded=True), 'bots_touch_user_pending_idx')
+
+    def test_orphaned_touches(self):
+        self.assertUsesIndex(orphaned_touches().values('user_id'), *PENDING_TOUCH_INDEXES)
+
+    def test_queue_depth(self):
+        self.assertUsesIndex(pending_touches().values('step__step').order_by(), *PENDING_TOUCH_INDEXES)
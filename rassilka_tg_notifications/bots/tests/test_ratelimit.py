@@ -0,0 +1,72 @@
+from unittest import mock
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+from django.utils import timezone
+from bots.models import Bot, Settings
+from bots.ratelimit import MIN_RATE_PER_MINUTE, RAMP_UP_AFTER_SUCCESSES, AdaptiveRateLimiter
+from bots.scheduler import dispatch_due_schedules
+
+
+class RateLimiterTests(SimpleTestCase):
+    def test_burst_then_wait(self):
+        limiter = AdaptiveRateLimiter()
+        limiter.configure(2, 60)
+        self.assertEqual(limiter.try_acquire('a'), 0)
+        self.assertEqual(limiter.try_acquire('a'), 0)
+        self.assertGreater(limiter.try_acquire('a'), 0)
+
+    def test_wait_time_does_not_take_a_token(self):
+        limiter = AdaptiveRateLimiter()
+        limiter.configure(1, 60)
+        self.assertEqual(limiter.wait_time('a'), 0)
+        self.assertEqual(limiter.try_acquire('a'), 0)
+        self.assertGreater(limiter.wait_time('a'), 0)
+
+    def test_non_positive_rates_are_clamped(self):
+        for rate in (0, -5):
+            limiter = AdaptiveRateLimiter()
+            limiter.configure(1, rate)
+            self.assertEqual(limiter.max_rate_per_minute, MIN_RATE_PER_MINUTE)
+            self.assertEqual(limiter.try_acquire('a'), 0)
+            self.assertGreater(limiter.try_acquire('a'), 0)
+
+    def test_zero_burst_still_allows_one_send(self):
+        limiter = AdaptiveRateLimiter()
+        limiter.configure(0, 60)
+        self.assertEqual(limiter.try_acquire('a'), 0)
+
+    def test_raised_maximum_applies_at_once(self):
+        limiter = AdaptiveRateLimiter()
+        limiter.configure(1, 1)
+        limiter.try_acquire('a')
+        limiter.configure(1, 10)
+        self.assertEqual(limiter._buckets['a'].rate_per_minute, 10)
+
+    def test_flood_wait_backoff_survives_reconfiguration(self):
+        limiter = AdaptiveRateLimiter()
+        limiter.configure(1, 10)
+        self.assertEqual(limiter.on_flood_wait('a', 0), 5)
+        limiter.configure(1, 20)
+        self.assertEqual(limiter._buckets['a'].rate_per_minute, 10)
+        for _ in range(RAMP_UP_AFTER_SUCCESSES):
+            limiter.on_success('a')
+        self.assertAlmostEqual(limiter._buckets['a'].rate_per_minute, 11)
+
+    def test_settings_reject_non_positive_rate(self):
+        for rate in (0, -1):
+            with self.assertRaises(ValidationError):
+                Settings(max_sends_per_minute=rate).full_clean()
+
+
+class DispatchRateLimitTests(SimpleTestCase):
+    def test_rate_limited_bot_claims_nothing(self):
+        limiter = AdaptiveRateLimiter()
+        limiter.configure(1, 60)
+        bot = Bot(name="Main", session_name='main')
+        limiter.try_acquire(bot.session_name)
+        with mock.patch('bots.scheduler.rate_limiter', limiter), mock.patch('bots.scheduler.claim_due_schedules') as claim:
+            due_schedules, retry_in = dispatch_due_schedules(timezone.now(), bot, 10)
+        # Claiming would fire the touch schedule NOTIFY and wake the scheduler before retry_in is up.
+        claim.assert_not_called()
+        self.assertEqual(due_schedules, [])
+        self.assertGreater(retry_in, 0)
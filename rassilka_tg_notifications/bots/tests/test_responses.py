@@ -0,0 +1,68 @@
+from datetime import datetime
+from django.test import TestCase
+from django.utils import timezone
+from bots.config import BOTS_KEY, SETTINGS_KEY, config_cache
+from bots.models import Bot, Message, Settings, TouchSchedule, TouchStep, User
+from bots.scheduler import pending_touches
+from bots.slots import SlotAllocator
+from bots.tasks import record_delivery
+from bots.telegram_listener import ResponseTracker
+
+START = timezone.make_aware(datetime(2026, 3, 2, 12, 0))
+
+
+class ResponseTests(TestCase):
+    def setUp(self):
+        config_cache.invalidate(SETTINGS_KEY, BOTS_KEY)
+        # Migrations seed a default touch sequence.
+        TouchStep.objects.all().delete()
+        Settings.objects.all().delete()
+        self.settings = Settings.objects.create(message_interval_minutes=6)
+        self.bot = Bot.objects.create(name="Main", session_name='main')
+        self.other_bot = Bot.objects.create(name="Other", session_name='other')
+        self.message = Message.objects.create(text="Hello")
+        self.user = User.objects.create(telegram_id='1', name="user_1", bot=self.bot)
+
+    def schedule(self, step_number, minutes, skip_if_responded=True):
+        step = TouchStep.objects.create(step=step_number, message=self.message, skip_if_responded=skip_if_responded)
+        return TouchSchedule.objects.create(
+            user=self.user, step=step, message=self.message, scheduled_time=START + timezone.timedelta(minutes=minutes)
+        )
+
+    def test_delivery_keeps_reply_and_reassignment_made_after_claim(self):
+        schedule = TouchSchedule.objects.select_related('user', 'step').get(pk=self.schedule(1, 0).pk)
+        User.objects.filter(pk=self.user.pk).update(responded=True, bot=self.other_bot)
+
+        record_delivery(schedule, self.bot, None)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.responded)
+        self.assertEqual(self.user.bot, self.other_bot)
+        self.assertIsNotNone(self.user.last_message_time)
+
+    def schedule_sequence(self):
+        return [self.schedule(1, 0, skip_if_responded=False), self.schedule(2, 6), self.schedule(3, 12)]
+
+    def test_reply_cancels_only_follow_ups_that_skip_on_reply(self):
+        kept, *follow_ups = self.schedule_sequence()
+
+        self.assertEqual(ResponseTracker().flush_responses([self.user.telegram_id]), (1, 2))
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.responded)
+        self.assertFalse(TouchSchedule.objects.get(pk=kept.pk).cancelled)
+        self.assertTrue(all(TouchSchedule.objects.get(pk=touch.pk).cancelled for touch in follow_ups))
+
+    def test_pending_touches_drop_follow_ups_of_users_who_replied(self):
+        kept, *_ = self.schedule_sequence()
+        # Replies flushed by another process may not have cancelled anything yet.
+        User.objects.filter(pk=self.user.pk).update(responded=True)
+
+        self.assertEqual(list(pending_touches()), [kept])
+
+    def test_cancelled_slot_can_be_allocated_again(self):
+        _, follow_up, _ = self.schedule_sequence()
+        ResponseTracker().flush_responses([self.user.telegram_id])
+
+        allocator = SlotAllocator.per_bot(TouchSchedule, [self.bot], self.settings)[self.bot.id]
+        self.assertEqual(allocator.allocate(follow_up.scheduled_time), follow_up.scheduled_time)
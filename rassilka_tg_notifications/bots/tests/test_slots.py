@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from unittest import mock
+from django.test import SimpleTestCase
+from django.utils import timezone
+from bots import slots
+from bots.slots import SlotAllocator, clamp_to_working_hours
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class SlotAllocatorTests(SimpleTestCase):
+    def test_free_time_is_rounded_up_to_the_grid(self):
+        allocator = SlotAllocator([], 6)
+        self.assertEqual(allocator.allocate(local(2026, 3, 2, 12, 0)), local(2026, 3, 2, 12, 0))
+        self.assertEqual(allocator.allocate(local(2026, 3, 2, 12, 7)), local(2026, 3, 2, 12, 12))
+
+    def test_same_start_gets_consecutive_slots(self):
+        allocator = SlotAllocator([], 6)
+        times = [allocator.allocate(local(2026, 3, 2, 12, 0)) for _ in range(3)]
+        self.assertEqual(times, [local(2026, 3, 2, 12, 0), local(2026, 3, 2, 12, 6), local(2026, 3, 2, 12, 12)])
+
+    def test_occupied_slots_are_skipped(self):
+        allocator = SlotAllocator([local(2026, 3, 2, 12, 0), local(2026, 3, 2, 12, 8)], 6)
+        # 12:08 is off the grid, so it blocks both 12:06 and 12:12.
+        self.assertEqual(allocator.allocate(local(2026, 3, 2, 12, 0)), local(2026, 3, 2, 12, 18))
+
+    def test_outside_working_hours_moves_to_next_morning(self):
+        allocator = SlotAllocator([], 6)
+        self.assertEqual(allocator.allocate(local(2026, 3, 2, 8, 30)), local(2026, 3, 2, 11, 0))
+        self.assertEqual(allocator.allocate(local(2026, 3, 2, 20, 58)), local(2026, 3, 3, 11, 0))
+        self.assertEqual(allocator.allocate(local(2026, 3, 2, 20, 54)), local(2026, 3, 2, 20, 54))
+        self.assertEqual(allocator.allocate(local(2026, 3, 2, 20, 54)), local(2026, 3, 3, 11, 6))
+
+    def test_ban_window_is_skipped(self):
+        allocator = SlotAllocator([], 6, ban_windows=[(None, local(2026, 3, 2, 13, 3))])
+        self.assertEqual(allocator.allocate(local(2026, 3, 2, 12, 0)), local(2026, 3, 2, 13, 6))
+
+    def test_zero_interval_falls_back_to_conflict_window(self):
+        allocator = SlotAllocator([], 0)
+        first = allocator.allocate(local(2026, 3, 2, 12, 0))
+        self.assertEqual(allocator.allocate(first) - first, timedelta(minutes=slots.SLOT_CONFLICT_MINUTES))
+
+    def test_dense_run_is_not_walked(self):
+        allocator = SlotAllocator([], 6)
+        start = local(2026, 3, 2, 12, 0)
+        count = 3000
+        with mock.patch.object(slots, 'clamp_to_working_hours', wraps=clamp_to_working_hours) as clamp:
+            first_touches = [allocator.allocate(start + timedelta(minutes=6 * index)) for index in range(count)]
+            follow_ups = [allocator.allocate(first + timedelta(minutes=30)) for first in first_touches]
+
+        allocated = first_touches + follow_ups
+        self.assertEqual(len(set(allocated)), len(allocated))
+        # Each bucket is checked against working hours once; walking the run would need ~count² / 2 checks.
+        self.assertLess(clamp.call_count, 4 * count)
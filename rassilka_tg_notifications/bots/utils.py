@@ -1,37 +1,31 @@
-from django.utils import timezone
-from datetime import timedelta
-from .models import Account, User, Message, Schedule, Settings
+import heapq
 import logging
+from django.db.models import Count
+from .models import Bot
 
-logger = logging.getLogger('bots')
+logger = logging.getLogger(__name__)
 
 
-def create_schedules():
-    settings = Settings.objects.first()
-    if not settings:
-        logger.error("Settings not found, cannot create schedules")
-        return
+def assign_bots(users, bots=None):
+    if bots is None:
+        bots = Bot.objects.filter(is_active=True)
+    bots = list(bots.annotate(user_count=Count('users')))
+    if not bots:
+        logger.error("No active bots found")
+        return []
 
-    accounts = Account.objects.filter(is_active=True)
-    users = User.objects.all()
-    first_touch_message = Message.objects.filter(is_second_touch=False).first()
+    active_ids = {bot.id for bot in bots}
+    least_loaded = [(bot.user_count, bot.id, bot) for bot in bots]
+    heapq.heapify(least_loaded)
 
-    if not first_touch_message:
-        logger.error("No first touch message found")
-        return
+    assigned = []
+    for user in users:
+        if user.bot_id in active_ids:
+            continue
+        user_count, bot_id, bot = heapq.heappop(least_loaded)
+        user.bot = bot
+        heapq.heappush(least_loaded, (user_count + 1, bot_id, bot))
+        assigned.append(user)
+        logger.debug("Assigned user %s to bot %s", user.telegram_id, bot.name)
 
-    if not accounts:
-        logger.error("No active accounts found")
-        return
-
-    current_time = timezone.now()
-    for i, user in enumerate(users):
-        account = accounts[i % len(accounts)]
-        scheduled_time = current_time + timedelta(minutes=settings.message_interval_minutes * i)
-        Schedule.objects.create(
-            user=user,
-            account=account,
-            message=first_touch_message,
-            scheduled_time=scheduled_time
-        )
-        logger.info(f"Scheduled message for {user.telegram_id} at {scheduled_time}")
\ No newline at end of file
+    return assigned
@@ -0,0 +1,6 @@
+from django.http import HttpResponse
+from bots import metrics
+
+
+def metrics_view(request):
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
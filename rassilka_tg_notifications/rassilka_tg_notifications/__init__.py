@@ -1 +1,5 @@
-default_app_config = 'rassilka_tg_notifications.apps.RassilkaTgNotificationsConfig'
\ No newline at end of file
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
+
+default_app_config = 'rassilka_tg_notifications.apps.RassilkaTgNotificationsConfig'
@@ -0,0 +1,16 @@
+import os
+from celery import Celery
+from celery.signals import worker_process_init
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rassilka_tg_notifications.settings')
+
+app = Celery('rassilka_tg_notifications')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
+
+
+@worker_process_init.connect
+def start_metrics_publishing(**kwargs):
+    from bots import metrics
+
+    metrics.start_publishing()
@@ -1,4 +1,5 @@
 import os
+import json
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -98,8 +99,8 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-CELERY_BROKER_URL = 'redis://localhost:6379/0'
-CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -111,26 +112,68 @@ CELERY_BEAT_MAX_LOOP_INTERVAL = 84460
 
 CELERY_ENABLE_UTC = True
 
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER') == '1'
+
+# Planning runs on the "scheduler" queue; each bot account is dispatched on its own "send.<session_name>"
+# queue, which should be consumed by exactly one worker with --concurrency=1.
+CELERY_TASK_ROUTES = {
+    'bots.tasks.plan_tick': {'queue': 'scheduler'},
+    'bots.tasks.dispatch_tick': {'queue': 'scheduler'},
+}
+
+# dispatch_tick is the only task that enqueues dispatch_bot; each run keeps sending for at most one interval.
+BOTS_DISPATCH_INTERVAL_SECONDS = float(os.getenv('BOTS_DISPATCH_INTERVAL_SECONDS', '15'))
+
+CELERY_BEAT_SCHEDULE = {
+    'bots-plan-tick': {
+        'task': 'bots.tasks.plan_tick',
+        'schedule': float(os.getenv('BOTS_PLAN_INTERVAL_SECONDS', '60')),
+    },
+    'bots-dispatch-tick': {
+        'task': 'bots.tasks.dispatch_tick',
+        'schedule': BOTS_DISPATCH_INTERVAL_SECONDS,
+    },
+}
+
+# "thread" runs the scheduler inside the web process, "celery" leaves it to beat and the workers.
+BOTS_SCHEDULER_MODE = os.getenv('BOTS_SCHEDULER_MODE', 'thread')
+
+BOTS_SENDER_BACKEND = os.getenv('BOTS_SENDER_BACKEND', 'bots.senders.TelethonBackend')
+BOTS_SENDER_OPTIONS = json.loads(os.getenv('BOTS_SENDER_OPTIONS', '{}'))
+
+# Upper bound for how long Settings and Bot changes from another process can go unnoticed.
+BOTS_CONFIG_TTL_SECONDS = float(os.getenv('BOTS_CONFIG_TTL_SECONDS', '30'))
+
+# Set to a Redis URL (e.g. the Celery broker) to have every process (web, scheduler, Celery workers) publish its
+# metrics there with an instance="<host>:<pid>" label, so scraping /metrics on any one web process returns all of
+# them. Aggregate across processes in queries, e.g. sum without (instance) (bots_messages_sent_total).
+# Empty by default: /metrics then exposes only the process that serves the request, which is all of them in the
+# default "thread" mode with a single web process.
+BOTS_METRICS_REDIS_URL = os.getenv('BOTS_METRICS_REDIS_URL', '')
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
-        'file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'debug.log',
+        'background': {
+            '()': 'bots.log.BackgroundHandler',
+            'filename': BASE_DIR / 'bots.log',
+            'max_bytes': 10 * 1024 * 1024,
+            'backup_count': 5,
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['file'],
-            'level': 'DEBUG',
-            'propagate': True,
+            'handlers': ['background'],
+            'level': 'INFO',
+            'propagate': False,
         },
         'bots': {
-            'handlers': ['file'],
-            'level': 'DEBUG',
-            'propagate': True,
+            'handlers': ['background'],
+            'level': LOG_LEVEL,
+            'propagate': False,
         },
     },
-}
\ No newline at end of file
+}
@@ -17,9 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from bots.admin_site import custom_admin_site
+from bots.views import metrics_view
 
 
 urlpatterns = [
     # path('admin/', admin.site.urls),
     path('admin/', custom_admin_site.urls),
+    path('metrics', metrics_view, name='metrics'),
 ]
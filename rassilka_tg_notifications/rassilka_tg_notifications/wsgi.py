@@ -12,7 +12,10 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rassilka_tg_notifications.settings')
 
-from bots.scheduler import start_scheduler
-start_scheduler()
-
 application = get_wsgi_application()
+
+from django.conf import settings
+
+if settings.BOTS_SCHEDULER_MODE == 'thread':
+    from bots.scheduler import start_scheduler
+    start_scheduler()